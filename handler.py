@@ -2,14 +2,11 @@
 from textblob_setup import setup
 from pydata29 import processor, io_handler
 
-# Download language model into AWS Lambda container.
-# This is only done once per concurrent thread
-# because the container is reused on subsequent calls.
+# Point NLTK at the language models bundled with the deployment package.
+# They are only downloaded into the container when the package was built
+# without them, and then only once, as the container is reused on
+# subsequent calls.
 setup()
 
 def process(event, context):
-    filepath = event['filepath']
-    processor.process_part(filepath)
-    return {
-        "filepath": filepath,
-    }
+    return processor.process_event(event)
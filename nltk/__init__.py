@@ -106,80 +106,298 @@ if not hasattr(subprocess, 'Popen'):
     subprocess.Popen = _fake_Popen
 
 ###########################################################
-# TOP-LEVEL MODULES
+# LAZY IMPORT MODE
 ###########################################################
 
-# Import top-level functionality into top-level namespace
+# With NLTK_LAZY_IMPORT set, importing nltk imports none of its packages.
+# Each top-level name is imported from the module the eager imports below
+# would have bound it from, on first access, so a program that only uses
+# nltk.tokenize and nltk.tag only pays for importing those.
 
-from nltk.collocations import *
-from nltk.decorators import decorator, memoize
-from nltk.featstruct import *
-from nltk.grammar import *
-from nltk.probability import *
-from nltk.text import *
-from nltk.tree import *
-from nltk.util import *
-from nltk.jsontags import *
+_LAZY_IMPORT = bool(os.environ.get('NLTK_LAZY_IMPORT'))
 
-###########################################################
-# PACKAGES
-###########################################################
+# The names the star imports below bind at the top level, by the module
+# that binds them: where several modules export a name, the last one
+# imported. Listed statically, so looking a name up imports only its
+# module. Regenerate it from the eager imports when they change.
+_STAR_EXPORTS = {
+    'nltk.collocations': '''
+        BigramCollocationFinder QuadgramCollocationFinder
+        TrigramCollocationFinder
+    ''',
+    'nltk.featstruct': '''
+        FeatDict FeatList FeatStruct FeatStructReader Feature RangeFeature
+        SLASH SlashFeature TYPE conflicts subsumes unify
+    ''',
+    'nltk.grammar': '''
+        CFG DependencyGrammar DependencyProduction Nonterminal PCFG
+        ProbabilisticDependencyGrammar ProbabilisticProduction Production
+        induce_pcfg nonterminals read_grammar
+    ''',
+    'nltk.probability': '''
+        ConditionalFreqDist ConditionalProbDist ConditionalProbDistI
+        CrossValidationProbDist DictionaryConditionalProbDist
+        DictionaryProbDist ELEProbDist FreqDist HeldoutProbDist
+        ImmutableProbabilisticMixIn KneserNeyProbDist LaplaceProbDist
+        LidstoneProbDist MLEProbDist MutableProbDist ProbDistI
+        SimpleGoodTuringProbDist UniformProbDist WittenBellProbDist add_logs
+        entropy sum_logs
+    ''',
+    'nltk.text': '''
+        ConcordanceIndex ContextIndex Text TextCollection TokenSearcher
+    ''',
+    'nltk.tree': '''
+        ImmutableMultiParentedTree ImmutableParentedTree
+        ImmutableProbabilisticTree ImmutableTree MultiParentedTree ParentedTree
+        ProbabilisticMixIn ProbabilisticTree Tree bracket_parse sinica_parse
+    ''',
+    'nltk.util': '''
+        AbstractLazySequence HTTPPasswordMgrWithDefaultRealm Index LRUCache
+        LazyConcatenation LazyEnumerate LazyMap LazySubsequence LazyZip
+        OrderedDict ProxyBasicAuthHandler ProxyDigestAuthHandler ProxyHandler
+        Trie bigrams binary_search_file bisect breadth_first build_opener chain
+        choose class_types clean_html clean_url collections combinations
+        defaultdict deque elementtree_indent everygrams filestring flatten
+        getproxies guess_encoding in_idle install_opener invert_dict
+        invert_graph islice locale ngrams os pad_sequence pprint pr
+        print_string py25 py26 py27 pydoc python_2_unicode_compatible
+        raise_unorderable_types re re_show set_proxy skipgrams slice_bounds
+        string_types text_type textwrap tokenwrap total_ordering
+        transitive_closure trigrams types unique_list usage version_info
+    ''',
+    'nltk.jsontags': '''
+        JSONTaggedDecoder JSONTaggedEncoder json_tags register_tag
+    ''',
+    'nltk.chunk': '''
+        ChunkParserI ChunkScore RegexpChunkParser RegexpParser conllstr2tree
+        conlltags2tree ieerstr2tree ne_chunk ne_chunk_sents tagstr2tree
+        tree2conllstr tree2conlltags
+    ''',
+    'nltk.classify': '''
+        BinaryMaxentFeatureEncoding ClassifierI
+        ConditionalExponentialClassifier DecisionTreeClassifier
+        MaxentClassifier MultiClassifierI NaiveBayesClassifier
+        PositiveNaiveBayesClassifier RTEFeatureExtractor Senna
+        SklearnClassifier TextCat TypedMaxentFeatureEncoding WekaClassifier
+        apply_features call_megam config_megam config_weka decisiontree maxent
+        megam naivebayes positivenaivebayes rte_classifier rte_classify
+        rte_features scikitlearn tadm textcat weka
+    ''',
+    'nltk.inference': '''
+        CfgReadingCommand DiscourseTester DrtGlueReadingCommand Mace
+        MaceCommand ParallelProverBuilder ParallelProverBuilderCommand Prover9
+        Prover9Command ReadingCommand ResolutionProver ResolutionProverCommand
+        TableauProver TableauProverCommand discourse mace prover9 resolution
+        tableau
+    ''',
+    'nltk.metrics': '''
+        AnnotationTask BigramAssocMeasures ConfusionMatrix ContingencyMeasures
+        NgramAssocMeasures Paice TrigramAssocMeasures accuracy agreement
+        approxrand association binary_distance confusionmatrix custom_distance
+        distance edit_distance f_measure fractional_presence ghd
+        interval_distance jaccard_distance log_likelihood masi_distance paice
+        pk precision presence ranks_from_scores ranks_from_sequence recall
+        scores segmentation spearman spearman_correlation windowdiff
+    ''',
+    'nltk.parse': '''
+        BllipParser BottomUpChartParser BottomUpLeftCornerChartParser
+        BottomUpProbabilisticChartParser ChartParser DependencyEvaluator
+        DependencyGraph EarleyChartParser FeatureBottomUpChartParser
+        FeatureBottomUpLeftCornerChartParser FeatureChartParser
+        FeatureEarleyChartParser FeatureIncrementalBottomUpChartParser
+        FeatureIncrementalBottomUpLeftCornerChartParser
+        FeatureIncrementalChartParser FeatureIncrementalTopDownChartParser
+        FeatureTopDownChartParser IncrementalBottomUpChartParser
+        IncrementalBottomUpLeftCornerChartParser IncrementalChartParser
+        IncrementalLeftCornerChartParser IncrementalTopDownChartParser
+        InsideChartParser LeftCornerChartParser LongestChartParser MaltParser
+        NaiveBayesDependencyScorer NonprojectiveDependencyParser ParserI
+        ProbabilisticNonprojectiveParser
+        ProbabilisticProjectiveDependencyParser ProjectiveDependencyParser
+        RandomChartParser RecursiveDescentParser ShiftReduceParser
+        SteppingChartParser SteppingRecursiveDescentParser
+        SteppingShiftReduceParser TestGrammar TopDownChartParser
+        TransitionParser UnsortedChartParser ViterbiParser bllip chart
+        dependencygraph earleychart extract_test_sentences featurechart
+        load_parser malt nonprojectivedependencyparser pchart
+        projectivedependencyparser recursivedescent shiftreduce
+        transitionparser viterbi
+    ''',
+    'nltk.tag': '''
+        AffixTagger BigramTagger BrillTagger BrillTaggerTrainer CRFTagger
+        ClassifierBasedPOSTagger ClassifierBasedTagger CompiledPerceptronTagger
+        ContextTagger DefaultTagger HiddenMarkovModelTagger
+        HiddenMarkovModelTrainer HunposTagger NgramTagger PERCEPTRON_CACHE_SIZE
+        PerceptronTagger RegexpTagger SennaChunkTagger SennaNERTagger
+        SennaTagger SequentialBackoffTagger StanfordNERTagger StanfordPOSTagger
+        StanfordTagger TaggerI TnT TrigramTagger UnigramTagger brill
+        brill_trainer crf hmm hunpos map_tag mapping perceptron pos_tag
+        pos_tag_sents print_function senna sequential str2tuple tag_documents
+        tagset_mapping tnt tuple2str untag
+    ''',
+    'nltk.tokenize': '''
+        BlanklineTokenizer LineTokenizer MWETokenizer PunktSentenceTokenizer
+        RegexpTokenizer SExprTokenizer SpaceTokenizer StanfordSegmenter
+        StanfordTokenizer TabTokenizer TextTilingTokenizer
+        TreebankWordTokenizer TweetTokenizer WhitespaceTokenizer
+        WordPunctTokenizer blankline_tokenize casual casual_tokenize
+        line_tokenize load load_punkt_tokenizer mwe punkt regexp_span_tokenize
+        regexp_tokenize sent_tokenize sexpr sexpr_tokenize simple stanford
+        stanford_segmenter string_span_tokenize texttiling treebank
+        word_tokenize wordpunct_tokenize
+    ''',
+    'nltk.translate': '''
+        AlignedSent Alignment IBMModel IBMModel1 IBMModel2 IBMModel3 IBMModel4
+        IBMModel5 PhraseTable StackDecoder alignment_error_rate bleu bleu_score
+        ibm1 ibm2 ibm3 ibm4 ibm5 ibm_model metrics ribes ribes_score
+        stack_decoder
+    ''',
+    'nltk.sem': '''
+        ApplicationExpression Assignment Boxer DRS DrtExpression Expression
+        FStructure LogicalExpressionException Model Undefined Valuation
+        Variable arity binding_ops boolean_ops boxer clause drt equality_preds
+        evaluate evaluate_sents extract_rels glue interpret_sents is_rel lfg
+        linearlogic logic parse_sents read_logic read_valuation relextract
+        root_semrep rtuple set2rel skolemize
+    ''',
+    'nltk.stem': '''
+        ISRIStemmer LancasterStemmer PorterStemmer RSLPStemmer RegexpStemmer
+        SnowballStemmer StemmerI WordNetLemmatizer api isri lancaster porter
+        regexp rslp snowball util wordnet
+    ''',
+}
 
-from nltk.chunk import *
-from nltk.classify import *
-from nltk.inference import *
-from nltk.metrics import *
-from nltk.parse import *
-from nltk.tag import *
-from nltk.tokenize import *
-from nltk.translate import *
-from nltk.sem import *
-from nltk.stem import *
-
-# Packages which can be lazily imported
-# (a) we don't import *
-# (b) they're slow to import or have run-time dependencies
-#     that can safely fail at run time
-
-from nltk import lazyimport
-app = lazyimport.LazyModule('nltk.app', locals(), globals())
-chat = lazyimport.LazyModule('nltk.chat', locals(), globals())
-corpus = lazyimport.LazyModule('nltk.corpus', locals(), globals())
-draw = lazyimport.LazyModule('nltk.draw', locals(), globals())
-toolbox = lazyimport.LazyModule('nltk.toolbox', locals(), globals())
-
-# Optional loading
+_STAR_NAMES = dict((name, module) for module, names in _STAR_EXPORTS.items()
+                   for name in names.split())
 
-try:
-    import numpy
-except ImportError:
-    pass
-else:
-    from nltk import cluster
+# Names imported explicitly, which take precedence over star imports.
+_NAMED_IMPORTS = {
+    'decorator': 'nltk.decorators',
+    'memoize': 'nltk.decorators',
+    'download': 'nltk.downloader',
+    'download_shell': 'nltk.downloader',
+    'download_gui': 'nltk.downloader',
+}
+
+def _is_submodule(name):
+    return any(os.path.isfile(os.path.join(path, name + '.py')) or
+               os.path.isfile(os.path.join(path, name, '__init__.py'))
+               for path in __path__)
+
+def _lazy_attribute(name):
+    """
+    Import the object the eager imports would bind to ``nltk.<name>``.
+
+    :raise AttributeError: if no eager import binds the name.
+    """
+    import importlib
+    if _is_submodule(name):
+        return importlib.import_module('nltk.' + name)
+    if name in _NAMED_IMPORTS:
+        return getattr(importlib.import_module(_NAMED_IMPORTS[name]), name)
+    if name in _STAR_NAMES:
+        return getattr(importlib.import_module(_STAR_NAMES[name]), name)
+    raise AttributeError("module 'nltk' has no attribute %r" % name)
+
+if not _LAZY_IMPORT:
+    ###########################################################
+    # TOP-LEVEL MODULES
+    ###########################################################
+
+    # Import top-level functionality into top-level namespace
+
+    from nltk.collocations import *
+    from nltk.decorators import decorator, memoize
+    from nltk.featstruct import *
+    from nltk.grammar import *
+    from nltk.probability import *
+    from nltk.text import *
+    from nltk.tree import *
+    from nltk.util import *
+    from nltk.jsontags import *
+
+    ###########################################################
+    # PACKAGES
+    ###########################################################
+
+    from nltk.chunk import *
+    from nltk.classify import *
+    from nltk.inference import *
+    from nltk.metrics import *
+    from nltk.parse import *
+    from nltk.tag import *
+    from nltk.tokenize import *
+    from nltk.translate import *
+    from nltk.sem import *
+    from nltk.stem import *
+
+    # Packages which can be lazily imported
+    # (a) we don't import *
+    # (b) they're slow to import or have run-time dependencies
+    #     that can safely fail at run time
+
+    from nltk import lazyimport
+    app = lazyimport.LazyModule('nltk.app', locals(), globals())
+    chat = lazyimport.LazyModule('nltk.chat', locals(), globals())
+    corpus = lazyimport.LazyModule('nltk.corpus', locals(), globals())
+    draw = lazyimport.LazyModule('nltk.draw', locals(), globals())
+    toolbox = lazyimport.LazyModule('nltk.toolbox', locals(), globals())
+
+    # Optional loading
 
-from nltk.downloader import download, download_shell
-try:
-    import tkinter
-except ImportError:
-    pass
-else:
     try:
-        from nltk.downloader import download_gui
-    except RuntimeError as e:
-        import warnings
-        warnings.warn("Corpus downloader GUI not loaded "
-                      "(RuntimeError during import: %s)" % str(e))
+        import numpy
+    except ImportError:
+        pass
+    else:
+        from nltk import cluster
 
-# explicitly import all top-level modules (ensuring
-# they override the same names inadvertently imported
-# from a subpackage)
+    from nltk.downloader import download, download_shell
+    try:
+        import tkinter
+    except ImportError:
+        pass
+    else:
+        try:
+            from nltk.downloader import download_gui
+        except RuntimeError as e:
+            import warnings
+            warnings.warn("Corpus downloader GUI not loaded "
+                          "(RuntimeError during import: %s)" % str(e))
+
+    # explicitly import all top-level modules (ensuring
+    # they override the same names inadvertently imported
+    # from a subpackage)
 
-from nltk import ccg, chunk, classify, collocations
-from nltk import data, featstruct, grammar, help, inference, metrics
-from nltk import misc, parse, probability, sem, stem, wsd
-from nltk import tag, tbl, text, tokenize, translate, tree, treetransforms, util
+    from nltk import ccg, chunk, classify, collocations
+    from nltk import data, featstruct, grammar, help, inference, metrics
+    from nltk import misc, parse, probability, sem, stem, wsd
+    from nltk import tag, tbl, text, tokenize, translate, tree, treetransforms, util
 
 
 # override any accidentally imported demo
 def demo():
     print("To run the demo code for a module, type nltk.module.demo()")
+
+
+if _LAZY_IMPORT:
+    import sys
+    import types
+
+    class _LazyNLTKModule(types.ModuleType):
+        """
+        The ``nltk`` module in lazy import mode, importing its attributes
+        with `_lazy_attribute` on first access.
+        """
+        def __getattr__(self, name):
+            if name.startswith('_'):
+                raise AttributeError(name)
+            value = _lazy_attribute(name)
+            setattr(self, name, value)
+            return value
+
+    # Keep a reference to this module, so its globals outlive the swap.
+    _lazy_module = _LazyNLTKModule(__name__, __doc__)
+    _lazy_module.__dict__.update(globals())
+    _lazy_module._eager_module = sys.modules[__name__]
+    sys.modules[__name__] = _lazy_module
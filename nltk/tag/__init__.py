@@ -74,10 +74,44 @@ from nltk.tag.hmm           import HiddenMarkovModelTagger, HiddenMarkovModelTra
 from nltk.tag.senna         import SennaTagger, SennaChunkTagger, SennaNERTagger
 from nltk.tag.mapping       import tagset_mapping, map_tag
 from nltk.tag.crf           import CRFTagger
-from nltk.tag.perceptron    import PerceptronTagger
+from nltk.tag.perceptron    import PerceptronTagger, CompiledPerceptronTagger
 
 from nltk.data import load
 
+# The pretrained tagger is loaded once per process and shared by every
+# call to pos_tag(), pos_tag_sents() and tag_documents().  When numpy is
+# available its weights are compiled into a dense matrix, which produces
+# the same tags faster, and the tags of the most recently seen feature
+# contexts are memoised for the lifetime of the process.
+try:
+    import numpy as _numpy
+except ImportError:
+    _compiled_tagger = False
+else:
+    _compiled_tagger = True
+
+#: The number of feature contexts the shared compiled tagger memoises.
+PERCEPTRON_CACHE_SIZE = 50000
+
+_perceptron_tagger = None
+
+def _get_tagger():
+    """
+    Return the process-wide :class:`.PerceptronTagger` (compiled when
+    numpy is installed), loading the pickled model on first use.
+    Subsequent calls in the same process reuse the loaded weights.
+
+    :rtype: PerceptronTagger
+    """
+    global _perceptron_tagger
+    if _perceptron_tagger is None:
+        if _compiled_tagger:
+            _perceptron_tagger = CompiledPerceptronTagger(
+                cache_size=PERCEPTRON_CACHE_SIZE)
+        else:
+            _perceptron_tagger = PerceptronTagger()
+    return _perceptron_tagger
+
 def _pos_tag(tokens, tagset, tagger):
     tagged_tokens = tagger.tag(tokens)
     if tagset:
@@ -107,8 +141,8 @@ def pos_tag(tokens, tagset=None):
     :return: The tagged tokens
     :rtype: list(tuple(str, str))
     """
-    tagger = PerceptronTagger()
-    return _pos_tag(tokens, tagset, tagger)    
+    tagger = _get_tagger()
+    return _pos_tag(tokens, tagset, tagger)
 
 
 def pos_tag_sents(sentences, tagset=None):
@@ -123,5 +157,29 @@ def pos_tag_sents(sentences, tagset=None):
     :return: The list of tagged sentences
     :rtype: list(list(tuple(str, str)))
     """
-    tagger = PerceptronTagger()
+    tagger = _get_tagger()
     return [_pos_tag(sent, tagset, tagger) for sent in sentences]
+
+
+def tag_documents(documents, tagset=None):
+    """
+    Tag a batch of documents with the shared part of speech tagger.
+    Each document is a list of tokens and is tagged as one sequence,
+    exactly as ``pos_tag(document)`` would tag it, but the model is
+    only looked up once for the whole batch, and the compiled tagger
+    advances all documents in lockstep, scoring one position of every
+    document per matrix operation.
+
+    :param documents: List of tokenized documents to be tagged
+    :type documents: list(list(str))
+    :param tagset: the tagset to be used, e.g. universal, wsj, brown
+    :type tagset: str
+    :return: The list of tagged documents
+    :rtype: list(list(tuple(str, str)))
+    """
+    tagged_documents = _get_tagger().tag_sents(documents)
+    if tagset:
+        tagged_documents = [[(token, map_tag('en-ptb', tagset, tag))
+                             for (token, tag) in tagged_tokens]
+                            for tagged_tokens in tagged_documents]
+    return tagged_documents
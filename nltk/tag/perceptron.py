@@ -17,9 +17,15 @@ from collections import defaultdict
 import pickle
 import logging
 
+try:
+    import numpy
+except ImportError:
+    pass
+
 from nltk.tag.api import TaggerI
 from nltk.data import find, load
 from nltk.compat import python_2_unicode_compatible
+from nltk.util import LRUCache
 
 PICKLE = "averaged_perceptron_tagger.pickle"
 
@@ -95,6 +101,111 @@ class AveragedPerceptron(object):
         '''Load the pickled model weights.'''
         self.weights = load(path)
 
+class CompiledPerceptron(object):
+
+    '''An inference-only form of :class:`AveragedPerceptron`.
+
+    Every feature produced by :meth:`PerceptronTagger._get_features` is
+    mapped to an integer row id (one lookup table per feature template,
+    keyed on the template's arguments rather than the joined feature
+    string), and the weights live in a dense ``(n_features, n_classes)``
+    numpy matrix.  Scoring a token is then a gather-and-sum over one row
+    per template.  The last row of the matrix is all zeros and stands in
+    for features that were never seen in training.
+
+    Columns are ordered by descending label, so that ``argmax`` (which
+    returns the first maximum) breaks ties exactly like
+    :meth:`AveragedPerceptron.predict`.  That method sums the weights in
+    the iteration order of the features dict, which is not template order
+    on Python 2, so two labels whose scores tie exactly there can differ
+    by a rounding error here.  :meth:`predict_batch` reports those tokens,
+    and :meth:`predict_in_order` rescores them in the dict's order.
+    '''
+
+    TEMPLATES = ('bias', 'i suffix', 'i pref1', 'i-1 tag', 'i-2 tag',
+                 'i tag+i-2 tag', 'i word', 'i-1 tag+i word', 'i-1 word',
+                 'i-1 suffix', 'i-2 word', 'i+1 word', 'i+1 suffix',
+                 'i+2 word')
+
+    # Templates whose feature strings join two arguments.
+    PAIRED = ('i tag+i-2 tag', 'i-1 tag+i word')
+
+    # Far above the rounding error of summing a token's weights, and far
+    # below any real difference between two scores.
+    TIE_MARGIN = 1e-9
+
+    def __init__(self, weights, classes):
+        '''
+        :param weights: the dict-of-dicts weights of a trained
+            :class:`AveragedPerceptron`
+        :param classes: the set of tags known to the model
+        '''
+        self.classes = sorted(classes, reverse=True)
+        class_ids = dict((c, i) for i, c in enumerate(self.classes))
+        self.template_ids = dict((t, i) for i, t in enumerate(self.TEMPLATES))
+        self.feature_ids = [{} for _ in self.TEMPLATES]
+
+        rows = []
+        for feat, feat_weights in weights.items():
+            template, args = self._split_feature(feat)
+            if template not in self.template_ids:
+                continue
+            self.feature_ids[self.template_ids[template]][args] = len(rows)
+            rows.append(feat_weights)
+
+        self.padding = len(rows)
+        self.weights = numpy.zeros((len(rows) + 1, len(self.classes)))
+        for row, feat_weights in enumerate(rows):
+            for label, weight in feat_weights.items():
+                self.weights[row, class_ids[label]] = weight
+
+    def _split_feature(self, feat):
+        '''Split a feature string into its template name and arguments.'''
+        if feat == 'bias':
+            return feat, ''
+        for template in self.PAIRED:
+            if feat.startswith(template + ' '):
+                args = feat[len(template) + 1:].split(' ', 1)
+                return template, tuple(args)
+        parts = feat.split(' ', 2)
+        return ' '.join(parts[:2]), parts[2] if len(parts) > 2 else ''
+
+    def feature_rows(self, i, word, context, prev, prev2):
+        '''Return the weight matrix row of every feature of a token, in
+        template order.  ``i`` and ``context`` are as for
+        :meth:`PerceptronTagger._get_features`.
+        '''
+        i += len(PerceptronTagger.START)
+        args = ('', word[-3:], word[0], prev, prev2, (prev, prev2),
+                context[i], (prev, context[i]), context[i-1],
+                context[i-1][-3:], context[i-2], context[i+1],
+                context[i+1][-3:], context[i+2])
+        padding = self.padding
+        return [ids.get(arg, padding)
+                for ids, arg in zip(self.feature_ids, args)]
+
+    def predict_batch(self, rows):
+        '''Score many tokens at once.  ``rows`` holds one list of feature
+        rows per token; returns the best label of each token, and the
+        indices of the tokens whose two best labels score within
+        ``TIE_MARGIN`` of each other.'''
+        scores = self.weights[numpy.array(rows)].sum(axis=1)
+        best = scores.argmax(axis=1)
+        tokens = numpy.arange(len(best))
+        top = scores[tokens, best]
+        scores[tokens, best] = -numpy.inf
+        ties = numpy.flatnonzero(top - scores.max(axis=1) <= self.TIE_MARGIN)
+        return [self.classes[c] for c in best], ties
+
+    def predict_in_order(self, rows):
+        '''Sum the weight rows of a token's features one at a time, in the
+        given order, and return the best label.'''
+        scores = numpy.zeros(len(self.classes))
+        for row in rows:
+            scores += self.weights[row]
+        return self.classes[scores.argmax()]
+
+
 @python_2_unicode_compatible
 class PerceptronTagger(TaggerI):
 
@@ -276,6 +387,184 @@ class PerceptronTagger(TaggerI):
                 self.tagdict[word] = tag
 
 
+class CompiledPerceptronTagger(PerceptronTagger):
+
+    '''
+    An inference-only :class:`PerceptronTagger` which scores tokens with a
+    :class:`CompiledPerceptron`.  It loads the same pickled model and
+    produces identical tags, but cannot be trained.  Requires numpy.
+
+    >>> from nltk.tag.perceptron import CompiledPerceptronTagger
+    >>> tagger = PerceptronTagger(load=False)
+    >>> tagger.train([[('today','NN'),('is','VBZ'),('good','JJ'),('day','NN')],
+    ... [('yes','NNS'),('it','PRP'),('beautiful','JJ')]])
+    >>> compiled = CompiledPerceptronTagger.from_tagger(tagger)
+    >>> sent = ['today','is','a','beautiful','day']
+    >>> compiled.tag(sent) == tagger.tag(sent)
+    True
+    >>> compiled.tag_sents([sent, sent[1:]]) == tagger.tag_sents([sent, sent[1:]])
+    True
+
+    Tokens whose tag is not in the tag dictionary can be memoised on
+    everything their features depend on, with a bounded LRU cache:
+
+    >>> cached = CompiledPerceptronTagger.from_tagger(tagger, cache_size=1000)
+    >>> cached.tag(sent) == cached.tag(sent) == tagger.tag(sent)
+    True
+    >>> cached.cache.hits, cached.cache.misses
+    (5, 5)
+    '''
+
+    def __init__(self, load=True, cache_size=None):
+        '''
+        :param load: Load and compile the pickled model upon instantiation.
+        :param cache_size: If given, remember the tags of up to this many
+            distinct feature contexts in ``self.cache``.
+        '''
+        self.compiled = None
+        self.cache = LRUCache(cache_size) if cache_size else None
+        PerceptronTagger.__init__(self, load)
+
+    @classmethod
+    def from_tagger(cls, tagger, cache_size=None):
+        '''
+        Compile the model of an already loaded or trained tagger.
+
+        :type tagger: PerceptronTagger
+        :rtype: CompiledPerceptronTagger
+        '''
+        compiled = cls(load=False, cache_size=cache_size)
+        compiled.tagdict = tagger.tagdict
+        compiled.classes = tagger.classes
+        compiled.compiled = CompiledPerceptron(tagger.model.weights,
+                                               tagger.classes)
+        return compiled
+
+    def tag(self, tokens):
+        '''
+        Tag tokenized sentences.
+        :params tokens: list of word
+        :type tokens: list(str)
+        '''
+        prev, prev2 = self.START
+        output = []
+
+        context = self.START + [self.normalize(w) for w in tokens] + self.END
+        for i, word in enumerate(tokens):
+            tag = self.tagdict.get(word)
+            if not tag and self.cache is not None:
+                key = self._cache_key(i, word, context, prev, prev2)
+                tag = self.cache.get(key)
+                if not tag:
+                    tag = self._predict([(i, word, context, prev, prev2)])[0]
+                    self.cache.put(key, tag)
+            elif not tag:
+                tag = self._predict([(i, word, context, prev, prev2)])[0]
+            output.append((word, tag))
+            prev2 = prev
+            prev = tag
+
+        return output
+
+    def tag_sents(self, sentences):
+        '''
+        Tag a batch of tokenized sentences in lockstep: position ``i`` of
+        every sentence is tagged in the same step, and the features of all
+        tokens at that position which are not in the tag dictionary are
+        scored with a single matrix operation.  Returns the same tags as
+        calling :meth:`tag` on each sentence.
+
+        :params sentences: list of sentences, each a list of words
+        :type sentences: list(list(str))
+        :rtype: list(list(tuple(str, str)))
+        '''
+        sentences = [list(sent) for sent in sentences]
+        # Longest first, so the sentences still being tagged at any
+        # position are always a prefix of the batch.
+        order = sorted(range(len(sentences)),
+                       key=lambda k: len(sentences[k]), reverse=True)
+        batch = [sentences[k] for k in order]
+        contexts = [self.START + [self.normalize(w) for w in sent] + self.END
+                    for sent in batch]
+        # Each history starts with the two START pseudo-tags, so that
+        # history[-1] and history[-2] are always prev and prev2.
+        histories = [list(reversed(self.START)) for _ in batch]
+
+        cache = self.cache
+        active = len(batch)
+        for i in range(len(batch[0]) if batch else 0):
+            while len(batch[active-1]) <= i:
+                active -= 1
+            pending = []
+            keys = []
+            tokens = []
+            for k in range(active):
+                word = batch[k][i]
+                history = histories[k]
+                tag = self.tagdict.get(word)
+                key = None
+                if not tag and cache is not None:
+                    key = self._cache_key(i, word, contexts[k],
+                                          history[-1], history[-2])
+                    tag = cache.get(key)
+                if not tag:
+                    pending.append(k)
+                    keys.append(key)
+                    tokens.append((i, word, contexts[k], history[-1], history[-2]))
+                history.append(tag)
+            if pending:
+                predicted = self._predict(tokens)
+                for k, key, tag in zip(pending, keys, predicted):
+                    histories[k][-1] = tag
+                    if key is not None:
+                        cache.put(key, tag)
+
+        tagged = [None] * len(batch)
+        for k, sent, history in zip(order, batch, histories):
+            tagged[k] = list(zip(sent, history[len(self.START):]))
+        return tagged
+
+    def _predict(self, tokens):
+        '''
+        The tags of ``tokens``, each the ``(i, word, context, prev, prev2)``
+        arguments of :meth:`_get_features`.  Tokens whose best tags tie
+        are rescored summing their features in the order of their features
+        dict, as :meth:`AveragedPerceptron.predict` does.
+        '''
+        compiled = self.compiled
+        rows = [compiled.feature_rows(*token) for token in tokens]
+        tags, ties = compiled.predict_batch(rows)
+        for j in ties:
+            features = self._get_features(*tokens[j])
+            order = [compiled.template_ids[compiled._split_feature(feat)[0]]
+                     for feat in features]
+            tags[j] = compiled.predict_in_order([rows[j][t] for t in order])
+        return tags
+
+    def _cache_key(self, i, word, context, prev, prev2):
+        '''Everything the features of the token at ``i`` depend on.'''
+        i += len(self.START)
+        return (word, prev, prev2, context[i-2], context[i-1],
+                context[i+1], context[i+2])
+
+    def train(self, sentences, save_loc=None, nr_iter=5):
+        raise NotImplementedError('CompiledPerceptronTagger is inference-only; '
+                                  'train a PerceptronTagger and compile it '
+                                  'with CompiledPerceptronTagger.from_tagger()')
+
+    def load(self, loc):
+        '''
+        Load a pickled model and compile it.  The dict-of-dicts weights are
+        released once compiled.
+
+        :param loc: Load a pickled model at location.
+        :type loc: str
+        '''
+        PerceptronTagger.load(self, loc)
+        self.compiled = CompiledPerceptron(self.model.weights, self.classes)
+        self.model.weights = {}
+
+
 def _pc(n, d):
     return (n / d) * 100
 
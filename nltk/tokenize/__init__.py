@@ -77,6 +77,24 @@ from nltk.tokenize.util     import string_span_tokenize, regexp_span_tokenize
 from nltk.tokenize.stanford_segmenter import StanfordSegmenter
 
 # Standard sentence tokenizer.
+# Punkt models are loaded once and held here for the life of the process,
+# so sent_tokenize() does not resolve the resource URL on every call.
+_punkt_tokenizers = {}
+
+def load_punkt_tokenizer(language='english'):
+    """
+    Return the :class:`.PunktSentenceTokenizer` for the specified language,
+    loading the model from the Punkt corpus on first use.
+
+    :param language: the model name in the Punkt corpus
+    :rtype: PunktSentenceTokenizer
+    """
+    tokenizer = _punkt_tokenizers.get(language)
+    if tokenizer is None:
+        tokenizer = load('tokenizers/punkt/{0}.pickle'.format(language))
+        _punkt_tokenizers[language] = tokenizer
+    return tokenizer
+
 def sent_tokenize(text, language='english'):
     """
     Return a sentence-tokenized copy of *text*,
@@ -87,7 +105,7 @@ def sent_tokenize(text, language='english'):
     :param text: text to split into sentences
     :param language: the model name in the Punkt corpus
     """
-    tokenizer = load('tokenizers/punkt/{0}.pickle'.format(language))
+    tokenizer = load_punkt_tokenizer(language)
     return tokenizer.tokenize(text)
 
 # Standard word tokenizer.
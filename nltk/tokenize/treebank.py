@@ -18,6 +18,7 @@ and available at http://www.cis.upenn.edu/~treebank/tokenizer.sed.
 
 import re
 from nltk.tokenize.api import TokenizerI
+from nltk.tokenize.util import align_tokens
 
 
 class TreebankWordTokenizer(TokenizerI):
@@ -93,6 +94,9 @@ class TreebankWordTokenizer(TokenizerI):
     CONTRACTIONS4 = [re.compile(r"(?i)\b(whad)(dd)(ya)\b"),
                      re.compile(r"(?i)\b(wha)(t)(cha)\b")]
 
+    # Tokens which are rewritten from a double quote in the source text.
+    QUOTE_ALIASES = {'``': '"', "''": '"'}
+
     def tokenize(self, text):
         for regexp, substitution in self.STARTING_QUOTES:
             text = regexp.sub(substitution, text)
@@ -121,4 +125,17 @@ class TreebankWordTokenizer(TokenizerI):
 
         return text.split()
 
+    def span_tokenize(self, text):
+        """
+        Return the offsets of the tokens in *text*, as a list of
+        ``(start, end)`` tuples.  Tokens which :meth:`tokenize` rewrites
+        from a double quote are mapped back to the quote.
+
+            >>> from nltk.tokenize import TreebankWordTokenizer
+            >>> s = 'She said "yes."'
+            >>> TreebankWordTokenizer().span_tokenize(s)
+            [(0, 3), (4, 8), (9, 10), (10, 13), (13, 14), (14, 15)]
+        """
+        return list(align_tokens(self.tokenize(text), text, self.QUOTE_ALIASES))
+
 
@@ -87,4 +87,37 @@ def spans_to_relative(spans):
         yield left - prev, right - left
         prev = right
 
+def align_tokens(tokens, sentence, aliases=None):
+    r"""
+    Return the offsets of *tokens* in *sentence*, as a sequence of
+    ``(start, end)`` tuples, by finding each token in turn after the end
+    of the previous one.  Tokens which a tokenizer rewrites can be listed
+    in *aliases*, mapping the token to the text it was rewritten from.
+
+        >>> from nltk.tokenize.util import align_tokens
+        >>> s = 'He said "hi" to them.'
+        >>> tokens = ['He', 'said', '``', 'hi', "''", 'to', 'them', '.']
+        >>> list(align_tokens(tokens, s, {'``': '"', "''": '"'}))
+        [(0, 2), (3, 7), (8, 9), (9, 11), (11, 12), (13, 15), (16, 20), (20, 21)]
 
+    :param tokens: the tokens of *sentence*, in order
+    :type tokens: list(str)
+    :param sentence: the text the tokens were taken from
+    :type sentence: str
+    :param aliases: the source text of tokens which are not substrings
+    :type aliases: dict(str, str)
+    :rtype: iter(tuple(int, int))
+    """
+    aliases = aliases or {}
+    point = 0
+    for token in tokens:
+        start = sentence.find(token, point)
+        alias = aliases.get(token)
+        if alias is not None:
+            alias_start = sentence.find(alias, point)
+            if alias_start != -1 and (start == -1 or alias_start < start):
+                start, token = alias_start, alias
+        if start == -1:
+            raise ValueError('substring "{0}" not found in "{1}"'.format(token, sentence))
+        point = start + len(token)
+        yield start, point
@@ -16,6 +16,7 @@ import os
 
 from itertools import islice, chain, combinations
 from pprint import pprint
+import collections
 from collections import defaultdict, deque
 from sys import version_info
 
@@ -1362,3 +1363,68 @@ class Trie(defaultdict):
             return d
         
         return _default_to_regular(self)
+
+######################################################################
+# Least Recently Used Cache
+######################################################################
+class LRUCache(object):
+    """A bounded cache which evicts its least recently used entry once it
+    holds ``maxsize`` entries, and counts lookup hits and misses.
+
+    :Example:
+
+    >>> from nltk.util import LRUCache
+    >>> cache = LRUCache(2)
+    >>> cache.put('a', 1)
+    >>> cache.put('b', 2)
+    >>> cache.get('a')
+    1
+    >>> cache.put('c', 3)
+    >>> cache.get('b') is None
+    True
+    >>> cache.hits, cache.misses, len(cache)
+    (1, 1, 2)
+
+    """
+    def __init__(self, maxsize):
+        """
+        :param maxsize: the maximum number of entries to hold
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the value cached for ``key``, marking it as recently used,
+        or ``default`` if it is not cached."""
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Cache ``value`` for ``key``, evicting the least recently used
+        entry if the cache is full."""
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries and reset the hit and miss counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return '<LRUCache: %d/%d entries, %d hits, %d misses>' % (
+            len(self._entries), self.maxsize, self.hits, self.misses)
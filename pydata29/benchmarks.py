@@ -0,0 +1,604 @@
+#!/usr/bin/env python
+import os
+import json
+import time
+import io_handler
+
+event_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          '..', 'event.json')
+
+def synthetic_articles(n_articles=1000):
+    """Build a part-sized list of article texts from the sample event."""
+    with open(event_path) as f:
+        text = json.load(f)['text']
+    return [text for _ in range(n_articles)]
+
+def load_articles(filepath=None, n_articles=1000):
+    if filepath:
+        return [r['content'] for r in io_handler.iter_jsonl_records(filepath)]
+    return synthetic_articles(n_articles)
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return time.time() - start, result
+
+def report(name, seconds, n_articles):
+    print("BENCHMARK::{}: {:.3f}s total, {:.3f}ms per article".format(
+        name,
+        seconds,
+        1000.0 * seconds / max(n_articles, 1)
+    ))
+
+def benchmark_tagging(filepath=None, n_articles=1000):
+    """
+    Per-article tagging cost of building a PerceptronTagger for every
+    article (the old pos_tag behaviour) versus the shared tagger used
+    through NLTKTagger.tag_documents.
+    """
+    from nltk.tag import PerceptronTagger
+    from textblob.tokenizers import word_tokenize
+    from textblob.taggers import NLTKTagger
+
+    articles = load_articles(filepath, n_articles)
+    tokens = [list(word_tokenize(a)) for a in articles]
+
+    before, _ = timed(lambda: [PerceptronTagger().tag(t) for t in tokens])
+    report('tagging, tagger per article', before, len(articles))
+
+    after, _ = timed(NLTKTagger().tag_documents, tokens, tokenize=False)
+    report('tagging, shared tagger', after, len(articles))
+    return before, after
+
+def benchmark_analysis(filepath=None, n_articles=1000):
+    """
+    Analysis time of a TextBlob per article, as the pipeline used to run,
+    versus processor.analyze_articles, counting the articles whose
+    sentiment differs from PatternAnalyzer on the raw text or whose
+    pronoun tags differ from TextBlob's.
+    """
+    from textblob import TextBlob
+    from textblob.sentiments import PatternAnalyzer
+    import processor
+
+    articles = load_articles(filepath, n_articles)
+    analyzer = PatternAnalyzer()
+    processor.warm_models()
+
+    def textblob_analysis(text):
+        blob = TextBlob(text, analyzer=analyzer)
+        return blob.tags, tuple(blob.sentiment)
+
+    before, golden = timed(lambda: [textblob_analysis(a) for a in articles])
+    report('analysis, TextBlob per article', before, len(articles))
+    after, analyses = timed(processor.analyze_articles, articles)
+    report('analysis, analyze_articles', after, len(articles))
+
+    def pronouns(tags):
+        return [(w, t) for w, t in tags if processor.is_pronoun(t)]
+
+    sentiments = sum(1 for (_, g), a in zip(golden, analyses)
+                     if g != (a.polarity, a.subjectivity))
+    tags = sum(1 for (g, _), a in zip(golden, analyses)
+               if pronouns(g) != pronouns(a.tags))
+    print("BENCHMARK::articles with different sentiment: {}".format(sentiments))
+    print("BENCHMARK::articles with different pronoun tags: {}".format(tags))
+    return sentiments, tags
+
+def benchmark_perceptron(filepath=None, n_articles=1000):
+    """
+    Tokens per second of the dict-of-dicts PerceptronTagger versus the
+    array-backed CompiledPerceptronTagger, one article at a time and with
+    the whole part tagged in lockstep, checking the tags are identical.
+    """
+    from nltk.tag.perceptron import PerceptronTagger, CompiledPerceptronTagger
+    from textblob.tokenizers import word_tokenize
+
+    articles = load_articles(filepath, n_articles)
+    tokens = [list(word_tokenize(a)) for a in articles]
+    n_tokens = sum(len(t) for t in tokens)
+    tagger = PerceptronTagger()
+    compiled = CompiledPerceptronTagger()
+    cached = CompiledPerceptronTagger(cache_size=50000)
+
+    runs = [
+        ('PerceptronTagger', lambda: [tagger.tag(t) for t in tokens]),
+        ('CompiledPerceptronTagger', lambda: [compiled.tag(t) for t in tokens]),
+        ('CompiledPerceptronTagger lockstep', lambda: compiled.tag_sents(tokens)),
+        ('CompiledPerceptronTagger lockstep, cold cache', lambda: cached.tag_sents(tokens)),
+        ('CompiledPerceptronTagger lockstep, warm cache', lambda: cached.tag_sents(tokens)),
+    ]
+    results = []
+    for name, run in runs:
+        seconds, tagged = timed(run)
+        print("BENCHMARK::{}: {:.0f} tokens/sec".format(name, n_tokens / seconds))
+        results.append(tagged)
+    print("BENCHMARK::{!r}".format(cached.cache))
+    identical = all(r == results[0] for r in results)
+    print("BENCHMARK::identical tags: {}".format(identical))
+    return identical
+
+def benchmark_lexicon(filepath=None, n_articles=1000):
+    """
+    Cold-start cost of loading the sentiment lexicon by parsing
+    en-sentiment.xml versus loading the precompiled snapshot.
+    """
+    from textblob.en import Sentiment, sentiment
+
+    from_xml = Sentiment(path=sentiment.path, synset='wordnet_id')
+    xml_seconds, _ = timed(from_xml.load)
+    print("BENCHMARK::lexicon from XML: {:.3f}s".format(xml_seconds))
+
+    from_snapshot = Sentiment(path=sentiment.path, synset='wordnet_id',
+                              snapshot=sentiment._snapshot)
+    snapshot_seconds, _ = timed(from_snapshot.load)
+    print("BENCHMARK::lexicon from snapshot: {:.3f}s".format(snapshot_seconds))
+    return xml_seconds, snapshot_seconds
+
+def benchmark_sentiment(filepath=None, n_articles=1000):
+    """
+    Sentiment scoring time of Sentiment.assessments per article versus
+    CompiledSentiment over the whole batch, on the same pattern tokens,
+    checking that the scores match PatternAnalyzer on the raw text of
+    every article.
+    """
+    from textblob.en import sentiment
+    from textblob.sentiments import PatternAnalyzer
+    from textblob._text import CompiledSentiment
+    import processor
+
+    articles = load_articles(filepath, n_articles)
+    words = [processor.sentiment_words(a) for a in articles]
+    len(sentiment)  # Loads the lexicon outside of the timings.
+
+    before, _ = timed(lambda: [tuple(sentiment(w)) for w in words])
+    report('sentiment, assessments per article', before, len(articles))
+    compiled = CompiledSentiment(sentiment)
+    after, scores = timed(compiled, words)
+    report('sentiment, compiled batch', after, len(articles))
+    print("BENCHMARK::{} token ids for {} distinct tokens".format(
+        len(compiled.ids), len(set(w for ws in words for w in ws))))
+
+    analyzer = PatternAnalyzer()
+    golden = [tuple(analyzer.analyze(a)) for a in articles]
+    mismatches = sum(1 for g, s in zip(golden, scores) if g != s)
+    print("BENCHMARK::articles with different scores: {}".format(mismatches))
+    return mismatches
+
+def benchmark_output(filepath=None, n_articles=1000):
+    """
+    Write and read time and bytes of the per-article and totals results of
+    a part as csv versus npz, checking the loaded results match.
+    """
+    import shutil
+    import tempfile
+    import processor
+
+    tmp = tempfile.mkdtemp()
+    try:
+        part_filepath = filepath
+        if not part_filepath:
+            part_filepath = os.path.join(tmp, 'parts', 'synthetic')
+            os.makedirs(os.path.dirname(part_filepath))
+            with open(part_filepath, 'w') as f:
+                for i, text in enumerate(synthetic_articles(n_articles)):
+                    f.write(json.dumps({'id': str(i), 'content': text,
+                                        'published': '2015-09-01'}) + '\n')
+        per_article_df, totals_series = processor.part_results(part_filepath)
+        target = os.path.join(tmp, 'parts', 'results')
+        for folder in ['articles', 'totals']:
+            if not os.path.exists(os.path.join(tmp, folder)):
+                os.makedirs(os.path.join(tmp, folder))
+
+        loaded = {}
+        for output_format in ['csv', 'npz']:
+            write_seconds, _ = timed(processor.write_part_results, target,
+                                     per_article_df, totals_series,
+                                     output_format)
+            articles_path = io_handler.file_path_to_output_path(
+                target, 'articles', output_format)
+            totals_path = io_handler.file_path_to_output_path(
+                target, 'totals', output_format)
+            read_seconds, loaded[output_format] = timed(lambda: (
+                io_handler.articles_loaders[output_format](articles_path),
+                io_handler.totals_loaders[output_format](totals_path)
+            ))
+            print("BENCHMARK::{}: write {:.3f}s, read {:.3f}s, {} bytes".format(
+                output_format,
+                write_seconds,
+                read_seconds,
+                os.path.getsize(articles_path) + os.path.getsize(totals_path)
+            ))
+        (csv_articles, csv_totals), (npz_articles, npz_totals) = (
+            loaded['csv'], loaded['npz'])
+        same = (csv_totals.sort_index().round(9).equals(npz_totals.sort_index().round(9)) and
+                (csv_articles[['polarity', 'subjectivity']].round(9).values ==
+                 npz_articles[['polarity', 'subjectivity']].round(9).values).all())
+        print("BENCHMARK::same results: {}".format(same))
+        return same
+    finally:
+        shutil.rmtree(tmp)
+
+def synthetic_totals(n_parts=10000, n_keys=400, keys_per_part=40, seed=0):
+    """Build totals Series like load_totals_csv_as_series gives for each part."""
+    import numpy
+    import pandas
+    random = numpy.random.RandomState(seed)
+    keys = numpy.array(["('w{}', 'PRP')".format(i) for i in range(n_keys)] +
+                       ['_male', '_female', '_neutral', '_positive', '_negative'],
+                       dtype=object)
+    totals = []
+    for _ in range(n_parts):
+        part_keys = keys[random.choice(len(keys), keys_per_part, replace=False)]
+        totals.append(pandas.Series(
+            random.randint(1, 100, keys_per_part).astype(float),
+            index=pandas.Index(part_keys, name='agg'),
+            name='count'
+        ))
+    return totals
+
+def benchmark_reduce(filepath=None, n_parts=10000):
+    """
+    Time to reduce the totals of n_parts parts with pairwise add_series,
+    with sum_series, and with a fan-in tree of sum_series across processes,
+    checking the sums are the same.
+    """
+    from functools import reduce
+    import master
+    import processor
+
+    totals = synthetic_totals(n_parts)
+    runs = [
+        ('pairwise add_series', lambda: reduce(processor.add_series, totals)),
+        ('sum_series', lambda: processor.sum_series(totals)),
+        ('fan-in tree of sum_series, width 100',
+         lambda: master.concurrent_reduce(processor.sum_series, totals, 100)),
+    ]
+    results = []
+    for name, run in runs:
+        seconds, reduced = timed(run)
+        print("BENCHMARK::{}: {:.3f}s for {} totals".format(name, seconds, n_parts))
+        results.append(reduced.sort_index())
+    same = all(r.equals(results[0]) for r in results)
+    print("BENCHMARK::same sums: {}".format(same))
+    return same
+
+cold_start_script = """
+import json, time
+start = time.time()
+import handler
+imported = time.time()
+handler.processor.analyze_article(json.loads({text!r}))
+analyzed = time.time()
+import textblob_setup
+print(json.dumps({{'import': imported - start,
+                  'first_article': analyzed - imported,
+                  'nltk_data': textblob_setup.NLTK_DATA}}))
+"""
+
+def benchmark_cold_start(filepath=None, n_runs=5):
+    """
+    Time importing handler and analysing a first article in fresh
+    interpreters, offline, with the models bundled by
+    textblob_setup.py bundle.
+    """
+    import subprocess
+    import sys
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    sys.path.insert(0, root)
+    import textblob_setup
+    if not textblob_setup.has_required_files(textblob_setup.BUNDLED_DATA):
+        raise RuntimeError("No models bundled in {}, run "
+                           "'python textblob_setup.py bundle' first".format(
+                               textblob_setup.BUNDLED_DATA))
+    with open(event_path) as f:
+        text = json.load(f)['text']
+    env = dict(os.environ)
+    env.pop('NLTK_DATA', None)
+    runs = []
+    for _ in range(n_runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', cold_start_script.format(text=json.dumps(text))],
+            cwd=root, env=env
+        )
+        runs.append(json.loads(output.decode('utf-8').strip().split('\n')[-1]))
+    for stage in ['import', 'first_article']:
+        seconds = sorted(r[stage] for r in runs)
+        print("BENCHMARK::cold start {}: median {:.3f}s, min {:.3f}s".format(
+            stage, seconds[len(seconds) // 2], seconds[0]))
+    print("BENCHMARK::models from {}".format(runs[-1]['nltk_data']))
+    return runs
+
+import_report_script = """
+import json, sys, time
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+seconds = {{}}
+builtin_import = builtins.__import__
+def timed_import(name, *args, **kwargs):
+    new = name not in sys.modules
+    start = time.time()
+    try:
+        return builtin_import(name, *args, **kwargs)
+    finally:
+        if new and name in sys.modules and name not in seconds:
+            seconds[name] = time.time() - start
+builtins.__import__ = timed_import
+
+start = time.time()
+{imports}
+total = time.time() - start
+modules = [m for m in sys.modules if m.split('.')[0] in ('nltk', 'textblob')]
+print(json.dumps({{'total': total, 'modules': len(modules), 'seconds': seconds}}))
+"""
+
+pipeline_imports = (
+    "from textblob.taggers import NLTKTagger\n"
+    "from textblob.tokenizers import SentenceWordTokenizer\n"
+    "from textblob.en import sentiment\n"
+    "from textblob._text import CompiledSentiment\n"
+)
+
+def benchmark_imports(filepath=None, n_slowest=10):
+    """
+    Import cost of the textblob and nltk modules the processor uses, with
+    nltk and textblob imported eagerly and in lazy import mode, and the
+    slowest imports in each mode, cumulative like python -X importtime.
+    """
+    import subprocess
+    import sys
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    script = import_report_script.format(imports=pipeline_imports)
+    reports = {}
+    for mode, lazy in [('eager', ''), ('lazy', '1')]:
+        env = dict(os.environ, NLTK_LAZY_IMPORT=lazy, TEXTBLOB_LAZY_IMPORT=lazy)
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=root, env=env)
+        report = json.loads(output.decode('utf-8').strip().split('\n')[-1])
+        print("BENCHMARK::{} imports: {:.3f}s, {} nltk and textblob modules".format(
+            mode, report['total'], report['modules']))
+        slowest = sorted(report['seconds'].items(), key=lambda i: -i[1])
+        for name, seconds in slowest[:n_slowest]:
+            print("BENCHMARK::    {:>8.1f}ms | {}".format(1000 * seconds, name))
+        reports[mode] = report
+    return reports
+
+def memory_usage():
+    """Resident and proportional set size of this process, in MB."""
+    usage = {}
+    path = '/proc/self/smaps_rollup'
+    if not os.path.exists(path):
+        path = '/proc/self/smaps'
+    with open(path) as f:
+        for line in f:
+            field = line.split(':')[0]
+            if field in ('Rss', 'Pss'):
+                usage[field] = usage.get(field, 0) + int(line.split()[1]) / 1024.0
+    return usage
+
+def first_article(start, text, stats, done):
+    import processor
+    processor.analyze_article(text)
+    usage = memory_usage()
+    stats.put((os.getpid(), time.time() - start, usage['Rss'], usage['Pss']))
+    # Stay alive until every worker is measured, so pages count as shared.
+    done.wait()
+
+def benchmark_prefork(filepath=None, n_workers=4):
+    """
+    Time to first article, RSS and PSS of each worker forked before any
+    model is loaded, as in the ProcessPoolExecutor of process_locally,
+    versus workers forked after processor.warm_models, as in prefork_map.
+    """
+    import multiprocessing
+    import processor
+
+    text = synthetic_articles(1)[0]
+    for mode in ['pool', 'prefork']:
+        start = time.time()
+        if mode == 'prefork':
+            processor.warm_models()
+            print("BENCHMARK::{}: models warmed in {:.3f}s".format(
+                mode, time.time() - start))
+        stats, done = multiprocessing.Queue(), multiprocessing.Event()
+        workers = [multiprocessing.Process(target=first_article,
+                                           args=(start, text, stats, done))
+                   for _ in range(n_workers)]
+        for worker in workers:
+            worker.start()
+        results = sorted(stats.get() for _ in workers)
+        done.set()
+        for worker in workers:
+            worker.join()
+        for pid, seconds, rss, pss in results:
+            print("BENCHMARK::{}: worker {} first article after {:.3f}s, "
+                  "RSS {:.0f}MB, PSS {:.0f}MB".format(mode, pid, seconds, rss, pss))
+
+def simulated_parts(n_parts=200, seed=0, folder=''):
+    """Parts like io_handler.discover_parts gives, with lognormal sizes."""
+    import random
+    rng = random.Random(seed)
+    return [{'path': '{}part-{:04}'.format(folder, i),
+             'size': int(1e6 * rng.lognormvariate(0, 0.5)),
+             'etag': None} for i in range(n_parts)]
+
+def simulated_invoke(parts, seconds_per_megabyte=0.05, straggler_rate=0.03,
+                     straggler_factor=20, seed=0):
+    """
+    An invoke for master.dispatch_parts that sleeps in proportion to the
+    part's size, straggler_factor times longer for a straggler_rate share
+    of invocations, as a slow container would, and counts its calls.
+    """
+    import random
+    import threading
+    rng, lock = random.Random(seed), threading.Lock()
+    sizes = dict((part['path'], part['size']) for part in parts)
+    calls = []
+    def invoke(filepath):
+        with lock:
+            calls.append(filepath)
+            straggler = rng.random() < straggler_rate
+        seconds = seconds_per_megabyte * sizes[filepath] / 1e6
+        time.sleep(seconds * (straggler_factor if straggler else 1))
+        return {'filepath': filepath, 'straggler': straggler}
+    invoke.calls = calls
+    return invoke
+
+def simulated_start(invoke, output_format='csv'):
+    """
+    A start for master.async_dispatch_parts that runs invoke on each part
+    of a batch on a background thread, as a queued event would run, then
+    writes the part's totals.
+    """
+    import storage
+    def start(batch):
+        def run():
+            for filepath in batch:
+                invoke(filepath)
+                io_handler.write_bytes(b'', io_handler.file_path_to_output_path(
+                    filepath, 'totals', output_format))
+        storage.BackgroundCall(run)
+    return start
+
+def benchmark_speculation(filepath=None, n_parts=200, window=20):
+    """
+    Makespan of dispatching simulated parts in name order, largest first,
+    and largest first with speculative copies of stragglers, invoked
+    synchronously and asynchronously.
+    """
+    import shutil
+    import tempfile
+    import master
+
+    parts = simulated_parts(n_parts)
+    runs = [
+        ('name order', [p['path'] for p in parts], master.dispatch_parts, {}),
+        ('largest first', master.order_by_size(parts), master.dispatch_parts, {}),
+        ('largest first, speculative', master.order_by_size(parts),
+         master.speculative_dispatch_parts, {'poll': 0.01}),
+    ]
+    for name, filepaths, dispatch, options in runs:
+        invoke = simulated_invoke(parts)
+        seconds, statuses = timed(lambda: list(dispatch(
+            filepaths, invoke, window=window, **options)))
+        print("BENCHMARK::{}: {:.2f}s for {} parts, {} invocations, "
+              "{} done".format(name, seconds, n_parts, len(invoke.calls),
+                               sum(s.status == 'done' for s in statuses)))
+
+    tmp = tempfile.mkdtemp()
+    try:
+        parts = simulated_parts(n_parts, folder=os.path.join(tmp, 'data', ''))
+        invoke = simulated_invoke(parts)
+        batches = [[f] for f in master.order_by_size(parts)]
+        seconds, statuses = timed(lambda: list(master.async_dispatch_parts(
+            batches, simulated_start(invoke), window=window, poll=0.01)))
+        print("BENCHMARK::largest first, speculative, asynchronous: {:.2f}s "
+              "for {} parts, {} invocations, {} done".format(
+                  seconds, n_parts, len(invoke.calls),
+                  sum(s.status == 'done' for s in statuses)))
+    finally:
+        shutil.rmtree(tmp)
+
+def benchmark_shards(filepath=None, n_articles=1000, max_workers=None):
+    """
+    Latency of part_results on one part with its articles analyzed in 1,
+    2, 4... processes, up to the number of cores, checking the results
+    are the same.
+    """
+    import multiprocessing
+    import tempfile
+    import processor
+
+    if not filepath:
+        part = tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False)
+        for i, text in enumerate(synthetic_articles(n_articles)):
+            part.write(json.dumps({'id': str(i), 'content': text,
+                                   'published': '2015-09-01'}) + '\n')
+        part.close()
+        filepath = part.name
+    processor.warm_models()
+    max_workers = max_workers or multiprocessing.cpu_count()
+    workers, baseline = 1, None
+    while workers <= max_workers:
+        seconds, (per_article_df, totals_series) = timed(
+            processor.part_results, filepath, workers=workers)
+        if baseline is None:
+            baseline = (per_article_df, totals_series)
+        same = (per_article_df.equals(baseline[0]) and
+                totals_series.equals(baseline[1]))
+        print("BENCHMARK::{} workers: {:.3f}s for {} articles, same: {}".format(
+            workers, seconds, len(per_article_df), same))
+        workers *= 2
+
+def benchmark_offline(filepath=None, n_parts=4, n_articles=250):
+    """
+    Time the whole pipeline against a directory standing in for S3, through
+    the same s3:// code paths as production: upload the parts, discover
+    them, process them as a batch, and reduce and dump the results.
+    """
+    import shutil
+    import tempfile
+    import storage
+    import master
+    import processor
+
+    tmp = tempfile.mkdtemp()
+    previous = io_handler.object_store
+    io_handler.use_object_storage(storage.DirectoryStorage(tmp))
+    try:
+        if filepath:
+            part = io_handler.read_file_path_bytes(filepath)
+        else:
+            part = ''.join(json.dumps({'id': str(i), 'content': text,
+                                       'published': '2015-09-01'}) + '\n'
+                           for i, text in enumerate(synthetic_articles(n_articles)))
+            part = part.encode('utf-8')
+        io_handler.object_storage().put_many('pydata-29', [
+            ('data/parts/{}{:04}'.format(io_handler.defaults['prefix'], i), part)
+            for i in range(n_parts)
+        ])
+        stages = [
+            ('discover', lambda: master.order_by_size(master.discover_parts(
+                's3://pydata-29/data/parts'))),
+            ('process', lambda: processor.process_parts(filepaths)),
+            ('results', lambda: master.dump_results(
+                master.results(filepaths), 's3://pydata-29/data')),
+        ]
+        for name, stage in stages:
+            seconds, value = timed(stage)
+            if name == 'discover':
+                filepaths = value
+            print("BENCHMARK::{}: {:.3f}s for {} parts".format(name, seconds,
+                                                              n_parts))
+        totals = io_handler.load_totals_csv_as_series(
+            's3://pydata-29/data/totals.csv')
+        print("BENCHMARK::{} totals, {:.0f} counted".format(len(totals),
+                                                            totals.sum()))
+    finally:
+        io_handler.use_object_storage(previous)
+        shutil.rmtree(tmp)
+
+benchmarks = {
+    'tagging': benchmark_tagging,
+    'analysis': benchmark_analysis,
+    'perceptron': benchmark_perceptron,
+    'lexicon': benchmark_lexicon,
+    'sentiment': benchmark_sentiment,
+    'output': benchmark_output,
+    'reduce': benchmark_reduce,
+    'cold_start': benchmark_cold_start,
+    'imports': benchmark_imports,
+    'prefork': benchmark_prefork,
+    'speculation': benchmark_speculation,
+    'shards': benchmark_shards,
+    'offline': benchmark_offline,
+}
+
+if __name__ == '__main__':
+    import sys
+    name = sys.argv[1].strip() if len(sys.argv) >= 2 else 'tagging'
+    filepath = sys.argv[2] if len(sys.argv) >= 3 else None
+    benchmarks[name](filepath)
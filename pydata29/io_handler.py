@@ -1,19 +1,34 @@
 #!/usr/bin/env python
+import io
+import os
 import re
+import json
+import shutil
+import tempfile
 import boto3
+import botocore.config
+import numpy
 import pandas
+import storage
 
 defaults = {
     'data_root': 'tmp/data',
     'prefix': 'signalmedia100s-',
-    'filepath_format': '{data_root}/{prefix}{num:0{width}}',
-    'width': 4,
     'articles_folder': 'articles',
     'totals_folder': 'totals',
 }
 
 re_s3_protocol_prefix = re.compile(r"^s3:\/\/")
 
+# The article fields the processor uses.
+article_fields = ['id', 'content', 'published']
+
+# Output formats of the processor, and the extension of their files.
+output_extensions = {
+    'csv': '',
+    'npz': '.npz',
+}
+
 s3 = None
 def s3_client():
     global s3
@@ -21,11 +36,47 @@ def s3_client():
         s3 = boto3.client('s3')
     return s3
 
+# s3:// paths are read and written through object_storage(): S3, or with
+# the PYDATA29_OBJECT_STORE environment variable set to a directory, that
+# directory standing in for S3 with one subdirectory per bucket.
+object_store = None
+def object_storage():
+    global object_store
+    if object_store is None:
+        root = os.environ.get('PYDATA29_OBJECT_STORE')
+        object_store = (storage.DirectoryStorage(root) if root
+                        else storage.S3Storage(s3_client()))
+    return object_store
+
+def use_object_storage(backend):
+    global object_store
+    object_store = backend
+    return backend
+
+local_storage = storage.DirectoryStorage()
+
+def storage_location(path):
+    """The storage holding path, and the bucket and key of path there."""
+    if re_s3_protocol_prefix.search(path):
+        bucket, _, key = re_s3_protocol_prefix.sub('', path).partition('/')
+        return object_storage(), bucket, key
+    return local_storage, '', path
+
+def location_path(bucket, key):
+    return 's3://{}/{}'.format(bucket, key) if bucket else key
+
+# Synchronous invocations wait for the function's 300s timeout, longer
+# than botocore's default read timeout, and the master retries them itself.
+lambda_read_timeout = 310
+
 lamb = None
 def lambda_client():
     global lamb
     if lamb is None:
-        lamb = boto3.client('lambda')
+        lamb = boto3.client('lambda', config=botocore.config.Config(
+            read_timeout=lambda_read_timeout,
+            retries={'max_attempts': 0}
+        ))
     return lamb
 
 def describe_file_path(filepath):
@@ -45,66 +96,259 @@ def describe_file_path(filepath):
         description['key'] = '{}/{}'.format('/'.join(bucket[1:]), path[-1])
     return description
 
-def list_file_paths(data_root       = defaults['data_root'],
-                    prefix          = defaults['prefix'],
-                    filepath_format = defaults['filepath_format'],
-                    width           = defaults['width']):
-    return [filepath_format.format(
-                data_root = data_root,
-                prefix    = prefix,
-                num       = num,
-                width     = width
-            ) for num in range(10000)]
-
 def load_jsonl_as_pandas(file_path, options = {}):
-    source = file_path
-    file = describe_file_path(file_path)
-    if file.get('bucket'):
-        r = s3_client().get_object(Bucket=file['bucket'],
-                                   Key=file['key'])
-        source = r['Body'].read().decode('utf-8')
+    source = read_file_path_bytes(file_path).decode('utf-8')
     return pandas.read_json(source, lines=True, **options)
 
-def file_path_to_output_path(file_path, folder='totals'):
+def open_file_path(file_path):
+    """Open a local path or S3 object as a binary stream."""
+    backend, bucket, key = storage_location(file_path)
+    return backend.open(bucket, key)
+
+def iter_lines(stream, chunk_size=1024 * 1024):
+    """Yield the lines of a binary stream, reading chunk_size bytes at a time."""
+    pending = b''
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+def iter_jsonl_records(file_path, fields=article_fields, stream=None):
+    """
+    Yield the records of a JSONL file one at a time, keeping only the
+    given fields, without holding the whole file in memory. stream is the
+    file already downloaded, e.g. by download_file_path, and is closed
+    once read.
+    """
+    stream = stream if stream is not None else open_file_path(file_path)
+    try:
+        for line in iter_lines(stream):
+            if line.strip():
+                record = json.loads(line.decode('utf-8'))
+                yield dict((f, record.get(f)) for f in fields)
+    finally:
+        stream.close()
+
+def load_jsonl_chunks(file_path, chunk_size=1000, fields=article_fields,
+                      stream=None):
+    """Yield DataFrames of up to chunk_size records of a JSONL file."""
+    chunk = []
+    for record in iter_jsonl_records(file_path, fields, stream):
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield pandas.DataFrame.from_records(chunk, columns=fields)
+            chunk = []
+    if chunk:
+        yield pandas.DataFrame.from_records(chunk, columns=fields)
+
+def file_path_to_output_path(file_path, folder='totals', output_format='csv'):
     file = describe_file_path(file_path)
-    return '{}/{}/{}'.format(
+    return '{}/{}/{}{}'.format(
         file['root_parent'],
         folder,
-        file['name']
+        file['name'],
+        output_extensions[output_format]
     )
 
-def load_totals_csv_as_series(file_path):
+def read_file_path_bytes(file_path, start=None, end=None):
+    """The bytes of a file, or of its bytes start to end included."""
+    backend, bucket, key = storage_location(file_path)
+    return backend.get(bucket, key, start, end)
+
+def download_file_path(file_path, chunk_size=1024 * 1024):
+    """
+    Copy a file to a temporary file on local disk, /tmp in Lambda, and
+    return it open at its start, so it can be streamed later without
+    holding it in memory. The temporary file is deleted once closed.
+    """
+    source = open_file_path(file_path)
+    target = tempfile.TemporaryFile()
     try:
-        return pandas.read_csv(file_path, sep=';', squeeze=True, index_col='agg')
+        shutil.copyfileobj(source, target, chunk_size)
+        target.seek(0)
     except:
-        return None
+        target.close()
+        raise
+    finally:
+        source.close()
+    return target
+
+def read_file_paths_bytes(file_paths, workers=16):
+    """
+    The bytes of each file, None where it is missing, read concurrently
+    from each bucket.
+    """
+    groups = {}
+    for i, file_path in enumerate(file_paths):
+        backend, bucket, key = storage_location(file_path)
+        groups.setdefault((backend, bucket), []).append((i, key))
+    data = [None] * len(file_paths)
+    for (backend, bucket), keys in groups.items():
+        values = backend.get_many(bucket, [key for _, key in keys], workers)
+        for (i, _), value in zip(keys, values):
+            data[i] = value
+    return data
 
-def load_articles_csv_as_df(file_path):
+def read_output_bytes(file_path, data=None):
+    """
+    data if given, else the bytes at file_path, or None if there is no
+    file there. Any other failure to read is raised.
+    """
+    if data is not None:
+        return data
     try:
-        return pandas.read_csv(file_path, sep=';', index_col='id').fillna(0)
-    except:
+        return read_file_path_bytes(file_path)
+    except storage.ObjectNotFound:
         return None
 
-def write_pandas_to_csv(pandas_object, path, options={}):
-    print("Writing to path {}...".format(path))
-    if path and re_s3_protocol_prefix.search(path):
-        file = describe_file_path(path)
-        bucket = file['bucket']
-        key = file['key']
-        csv = pandas_object.to_csv(None, **options)
-        s3 = s3_client()
-        print("Writing file {} to S3 bucket {}".format(
-            key,
-            bucket
-        ))
-        response = s3.put_object(Body   = csv,
-                                 Bucket = bucket,
-                                 Key    = key)
+def load_totals_csv_as_series(file_path, data=None):
+    data = read_output_bytes(file_path, data)
+    if data is None:
+        return None
+    return pandas.read_csv(io.BytesIO(data), sep=';', squeeze=True,
+                           index_col='agg')
+
+def load_articles_csv_as_df(file_path, data=None):
+    data = read_output_bytes(file_path, data)
+    if data is None:
+        return None
+    return pandas.read_csv(io.BytesIO(data), sep=';', index_col='id').fillna(0)
+
+def text_array(values):
+    return numpy.array([u'' if v is None else u'{}'.format(v) for v in values],
+                       dtype=numpy.unicode_)
+
+def column_array(column):
+    if column.dtype == object:
+        return text_array(column)
+    return column.values
+
+def pandas_to_npz(pandas_object, options={}):
+    """
+    Serialize a DataFrame or Series to the bytes of an .npz archive with
+    one typed array per column:
+
+    kind        'frame' or 'series'
+    index       the index, as text
+    index_name  options['index_label'], or the index name
+    columns     the column names of a frame, as text
+    column_<i>  the values of the i-th column of a frame
+    values      the values of a series
+    name        options['header'][0], or the series name
+    """
+    index_name = options.get('index_label', pandas_object.index.name)
+    arrays = {
+        'index': text_array(pandas_object.index),
+        'index_name': text_array([index_name]),
+    }
+    if isinstance(pandas_object, pandas.DataFrame):
+        arrays['kind'] = text_array(['frame'])
+        arrays['columns'] = text_array(pandas_object.columns)
+        for i, c in enumerate(pandas_object.columns):
+            arrays['column_{}'.format(i)] = column_array(pandas_object[c])
     else:
-        print("Writing file {} to filesystem.".format(path))
-        pandas_object.to_csv(path, **options)
+        arrays['kind'] = text_array(['series'])
+        arrays['values'] = column_array(pandas_object)
+        arrays['name'] = text_array(options.get('header', [pandas_object.name])[:1])
+    buf = io.BytesIO()
+    numpy.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+def npz_to_pandas(data):
+    arrays = numpy.load(io.BytesIO(data))
+    index = pandas.Index(arrays['index'], name=arrays['index_name'][0] or None)
+    if arrays['kind'][0] == 'series':
+        return pandas.Series(arrays['values'], index=index,
+                             name=arrays['name'][0] or None)
+    columns = arrays['columns']
+    return pandas.DataFrame(
+        dict((c, arrays['column_{}'.format(i)]) for i, c in enumerate(columns)),
+        index=index,
+        columns=columns
+    )
+
+def load_totals_npz_as_series(file_path, data=None):
+    data = read_output_bytes(file_path, data)
+    if data is None:
+        return None
+    return npz_to_pandas(data)
+
+def load_articles_npz_as_df(file_path, data=None):
+    data = read_output_bytes(file_path, data)
+    if data is None:
+        return None
+    return npz_to_pandas(data).fillna(0)
+
+def write_bytes(data, path):
+    backend, bucket, key = storage_location(path)
+    backend.put(bucket, key, data)
+    return path
+
+def list_folder(folder_path, name_prefix = ''):
+    """
+    Describe the files directly in a local folder or S3 prefix whose names
+    start with name_prefix, from one listing, as a dict from file name to
+    its path, size, etag (S3 only) and mtime in seconds since the epoch.
+    """
+    files = {}
+    backend, bucket, folder = storage_location(folder_path.rstrip('/'))
+    prefix = '{}/{}'.format(folder, name_prefix) if folder else name_prefix
+    for obj in backend.list(bucket, prefix):
+        files[obj['key'].split('/')[-1]] = {
+            'path': location_path(bucket, obj['key']),
+            'size': obj['size'],
+            'etag': obj['etag'],
+            'mtime': obj['mtime'],
+        }
+    return files
+
+def discover_parts(data_root = defaults['data_root'],
+                   prefix    = defaults['prefix']):
+    """
+    List the parts under data_root whose names start with prefix, sorted
+    by path, each described by list_folder with its path, size and etag.
+    """
+    parts = list_folder(data_root, prefix).values()
+    return sorted(parts, key=lambda part: part['path'])
+
+def file_path_exists(file_path):
+    backend, bucket, key = storage_location(file_path)
+    return backend.head(bucket, key) is not None
+
+def write_pandas_to_npz(pandas_object, path, options={}):
+    print("Writing to path {}...".format(path))
+    write_bytes(pandas_to_npz(pandas_object, options), path)
     print("Wrote to path {}!".format(path))
     return path
+
+def write_pandas_to_csv(pandas_object, path, options={}, output_format='csv'):
+    """
+    Write pandas_object as csv, or with output_format='npz' as an .npz
+    archive of typed columns, which only uses the index_label and header
+    options.
+    """
+    if output_format == 'npz':
+        return write_pandas_to_npz(pandas_object, path, options)
+    print("Writing to path {}...".format(path))
+    csv = pandas_object.to_csv(None, **options)
+    if not isinstance(csv, bytes):
+        csv = csv.encode('utf-8')
+    write_bytes(csv, path)
+    print("Wrote to path {}!".format(path))
+    return path
+
+totals_loaders = {
+    'csv': load_totals_csv_as_series,
+    'npz': load_totals_npz_as_series,
+}
+
+articles_loaders = {
+    'csv': load_articles_csv_as_df,
+    'npz': load_articles_npz_as_df,
+}
 if __name__ == '__main__':
     from pprint import PrettyPrinter
     pp = PrettyPrinter()
@@ -115,7 +359,7 @@ if __name__ == '__main__':
         from loader import *
 
         pp.pprint('listing file paths...')
-        file_paths = list_file_paths()
+        file_paths = [part['path'] for part in discover_parts()]
         pp.pprint(len(file_paths))
         pp.pprint(file_paths[-1])
 
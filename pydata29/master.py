@@ -1,8 +1,16 @@
 #!/usr/bin/env python
-import copy
+import io
+import json
+import time
+import random
+import multiprocessing
+import botocore.exceptions
 import concurrent.futures
+import pandas
+from collections import Counter, deque, namedtuple
 import processor
 import io_handler
+import storage
 
 def chunks(l, n):
     """
@@ -20,7 +28,7 @@ def chunk_generator(g, n):
         chunk += [el]
         i += 1
         if i % n == 0:
-            yield copy.deepcopy(chunk)
+            yield chunk
             chunk = []
     if chunk:
         yield chunk
@@ -31,32 +39,93 @@ def concurrent_map(fn, data,
     with executor_class(**executor_params) as executor:
         return executor.map(fn, data)
 
-def concurrent_reduce(fn, data, chunk_size = 100):
-    """
-    This ends up being slower for the dataset used for these experiments.
-    Maybe if you have data that won't fit into memory it is a good option,
-    but using dask dataframe might also be a good option.
-    """
-    size = chunk_size
-    reduced = [d for d in copy.deepcopy(data) if d is not None]
-    while len(reduced) > 1:
-        data_chunks = list(chunk_generator(reduced, size))
-        print("Reducing {} chunks".format(len(data_chunks)))
-        reduced = list(concurrent_map(fn, data_chunks))
-        size /= 10
-        size = size or 1
-    return reduced[0]
-
-def results(filepaths):
-    totals_filepaths = [io_handler.file_path_to_output_path(f, 'totals') for f in filepaths]
-    articles_filepaths = [io_handler.file_path_to_output_path(f, 'articles') for f in filepaths]
+def concurrent_reduce(fn, data, chunk_size = 100,
+                      executor_class = concurrent.futures.ProcessPoolExecutor,
+                      executor_params = {}):
+    """
+    Reduce data in a fan-in tree of width chunk_size: every level maps fn
+    over chunks of the previous level's results concurrently, until one
+    result is left. fn takes a list, like processor.sum_series.
+    """
+    size = max(chunk_size, 2)
+    reduced = [d for d in data if d is not None]
+    with executor_class(**executor_params) as executor:
+        while len(reduced) > 1:
+            data_chunks = list(chunks(reduced, size))
+            print("Reducing {} chunks".format(len(data_chunks)))
+            reduced = list(executor.map(fn, data_chunks))
+    return reduced[0] if reduced else None
+
+def load_outputs(loader, filepaths):
+    """Load the outputs at filepaths, read concurrently, None where missing."""
+    data = io_handler.read_file_paths_bytes(filepaths)
+    return [loader(f, d) if d is not None else None
+            for f, d in zip(filepaths, data)]
+
+def results(filepaths, output_format='csv'):
+    totals_filepaths = [io_handler.file_path_to_output_path(f, 'totals', output_format)
+                        for f in filepaths]
+    articles_filepaths = [io_handler.file_path_to_output_path(f, 'articles', output_format)
+                          for f in filepaths]
     yield processor.reduce_series_list(
-        map(io_handler.load_totals_csv_as_series, totals_filepaths)
+        load_outputs(io_handler.totals_loaders[output_format], totals_filepaths)
     )
     yield processor.concat_dataframe_list(
-        map(io_handler.load_articles_csv_as_df, articles_filepaths)
+        load_outputs(io_handler.articles_loaders[output_format], articles_filepaths)
     )
 
+def load_totals_state(path):
+    """
+    Load the state of incremental_results: the names of the parts folded so
+    far and their running totals.
+    """
+    if not io_handler.file_path_exists(path):
+        return {'parts': [], 'totals': {}}
+    return json.loads(io_handler.read_file_path_bytes(path).decode('utf-8'))
+
+def write_totals_state(state, path):
+    io_handler.write_bytes(json.dumps(state).encode('utf-8'), path)
+    return path
+
+def totals_state_series(state):
+    totals = pandas.Series(state['totals'], dtype=float, name='count')
+    totals.index.name = 'agg'
+    return totals
+
+def incremental_results(filepaths, root, output_format='csv', batch_size=1000):
+    """
+    Fold the totals of parts not yet folded into the running totals kept in
+    {root}/totals_state.json, and return them.
+
+    The state holds both the folded part names and the totals, so a single
+    write saves them together. It is saved after every batch_size parts,
+    so a rerun after a crash only reads parts it has not folded. Parts
+    without totals yet are reported and left unfolded, to be picked up
+    once their totals land. Totals that exist but cannot be read raise.
+    """
+    state_path = '{}/totals_state.json'.format(root)
+    state = load_totals_state(state_path)
+    folded = set(state['parts'])
+    unseen = [f for f in filepaths
+              if io_handler.describe_file_path(f)['name'] not in folded]
+    print("PROGRESS::{} parts folded, {} to fold".format(len(folded), len(unseen)))
+    load_totals = io_handler.totals_loaders[output_format]
+    totals = totals_state_series(state)
+    for batch in chunks(unseen, batch_size):
+        names = [io_handler.describe_file_path(f)['name'] for f in batch]
+        loaded = list(zip(names, load_outputs(load_totals, [
+            io_handler.file_path_to_output_path(f, 'totals', output_format)
+            for f in batch])))
+        missing = [name for name, series in loaded if series is None]
+        if missing:
+            print("PROGRESS::No totals for {} parts: {}".format(
+                len(missing), ', '.join(missing)))
+        totals = processor.sum_series([totals] + [series for _, series in loaded])
+        state['parts'].extend(name for name, series in loaded if series is not None)
+        state['totals'] = dict(zip(totals.index, totals.values.tolist()))
+        write_totals_state(state, state_path)
+    return totals
+
 def dump_results(generator, root):
     io_handler.write_pandas_to_csv(next(generator),
                                    '{}/totals.csv'.format(root),
@@ -70,24 +139,428 @@ def dump_results(generator, root):
                                     'index' : True,
                                     'sep' : ';'})
 
-def process_locally():
-    filepaths = io_handler.list_file_paths()[:10]
+def unprocessed_parts(parts, output_format='csv'):
+    """
+    Keep the parts from discover_parts without up-to-date outputs: parts
+    missing their articles or totals output, or with an output older than
+    the part's listed mtime. Each articles and totals folder is listed
+    once, instead of checking every part on its own.
+    """
+    listings = {}
+    def listing(folder_path):
+        if folder_path not in listings:
+            listings[folder_path] = io_handler.list_folder(folder_path)
+        return listings[folder_path]
+
+    unprocessed = []
+    extension = io_handler.output_extensions[output_format]
+    for source in parts:
+        part = io_handler.describe_file_path(source['path'])
+        outputs = [listing('{}/{}'.format(part['root_parent'], folder))
+                   .get(part['name'] + extension)
+                   for folder in ['articles', 'totals']]
+        if not all(o and o['mtime'] >= source['mtime'] for o in outputs):
+            unprocessed.append(source)
+    print("PROGRESS::{} of {} parts to process".format(len(unprocessed),
+                                                       len(parts)))
+    return unprocessed
+
+def prefork_map(fn, data, workers = None):
+    """
+    Map fn over data in a pool of worker processes forked after loading
+    the models in this process, so every worker shares the loaded model
+    pages copy-on-write instead of loading its own copy.
+    """
+    processor.warm_models()
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(fn, data, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def discover_parts(data_root = io_handler.defaults['data_root'],
+                   limit = None):
+    """
+    The parts under data_root, or the first limit of them, as listed by
+    io_handler.discover_parts with their sizes, largest first so the
+    longest parts do not start last.
+    """
+    parts = io_handler.discover_parts(data_root)[:limit]
+    print('PROGRESS::Discovered {} parts, {:.1f}MB'.format(
+        len(parts), sum(part['size'] for part in parts) / 1e6))
+    return sorted(parts, key=lambda part: (-part['size'], part['path']))
+
+def process_locally(skip_processed = False, prefork = False, limit = None):
+    parts = discover_parts(limit=limit)
+    if skip_processed:
+        parts = unprocessed_parts(parts)
+    filepaths = order_by_size(parts)
+    if prefork:
+        return prefork_map(processor.process_part, filepaths)
     return concurrent_map(processor.process_part, filepaths)
 
-def process_lambda(concurrency = 850):
-    filepaths = io_handler.list_file_paths(data_root='s3://pydata-29/data')[:10]
-    return concurrent_map(processor.process_filepath_in_lambda, filepaths,
-                          executor_class=concurrent.futures.ThreadPoolExecutor,
-                          executor_params={'max_workers': concurrency})
+PartStatus = namedtuple('PartStatus', ['filepath', 'status', 'attempts',
+                                       'seconds', 'result', 'error'])
+
+throttling_errors = ['TooManyRequestsException', 'ThrottlingException']
+
+def is_throttled(error):
+    return (isinstance(error, botocore.exceptions.ClientError) and
+            error.response['Error']['Code'] in throttling_errors)
+
+def invoke_part(invoke, filepath, retries = 5, backoff = 1.0,
+                sleep = time.sleep):
+    """
+    Call invoke(filepath), retrying throttled calls up to retries times
+    after a jittered backoff that doubles every attempt, and return the
+    PartStatus: 'done', 'throttled' once retries run out, or 'failed'.
+    """
+    start = time.time()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            result = invoke(filepath)
+            return PartStatus(filepath, 'done', attempt, time.time() - start,
+                              result, None)
+        except Exception as e:
+            if is_throttled(e) and attempt <= retries:
+                sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                continue
+            return PartStatus(filepath,
+                              'throttled' if is_throttled(e) else 'failed',
+                              attempt, time.time() - start, None,
+                              '{}: {}'.format(e.__class__.__name__, e))
+
+def dispatch_parts(filepaths,
+                   invoke = processor.process_filepath_in_lambda,
+                   window = 100, retries = 5, backoff = 1.0):
+    """
+    Invoke every part with at most window invocations in flight, and yield
+    the PartStatus of each part as it completes.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=window) as executor:
+        futures = [executor.submit(invoke_part, invoke, f, retries, backoff)
+                   for f in filepaths]
+        for future in concurrent.futures.as_completed(futures):
+            status = future.result()
+            print("PROGRESS::Part {} {} after {} attempts in {:.1f}s".format(
+                status.filepath, status.status, status.attempts, status.seconds))
+            yield status
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+def speculative_dispatch_parts(filepaths,
+                               invoke = processor.process_filepath_in_lambda,
+                               window = 100, retries = 5, backoff = 1.0,
+                               speculate_percentile = 0.9,
+                               speculate_factor = 1.5,
+                               min_samples = 5, poll = 1.0):
+    """
+    Like dispatch_parts, invoking parts in the order given, but once every
+    part has started, free slots invoke a second copy of the parts running
+    longer than speculate_factor times the speculate_percentile of the
+    runtimes of done parts, longest running first. The first copy to finish
+    is yielded and the other is ignored: both write the same outputs.
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=window)
+    queue = deque(enumerate(filepaths))
+    running = {}
+    copies = Counter()
+    speculated, finished = set(), set()
+    seconds = []
+
+    def submit(index, filepath):
+        future = executor.submit(invoke_part, invoke, filepath, retries, backoff)
+        running[future] = (index, filepath, time.time())
+        copies[index] += 1
+
+    try:
+        while len(finished) < len(filepaths):
+            while queue and len(running) < window:
+                submit(*queue.popleft())
+            if not queue and len(seconds) >= min_samples:
+                threshold = speculate_factor * percentile(seconds,
+                                                          speculate_percentile)
+                now = time.time()
+                stragglers = sorted(
+                    (start, index, filepath)
+                    for index, filepath, start in running.values()
+                    if index not in speculated and index not in finished
+                    and now - start > threshold
+                )
+                for start, index, filepath in stragglers[:window - len(running)]:
+                    print("PROGRESS::Part {} running for {:.1f}s, over {:.1f}s, "
+                          "invoking a second copy".format(
+                              filepath, now - start, threshold))
+                    speculated.add(index)
+                    submit(index, filepath)
+            done, _ = concurrent.futures.wait(
+                list(running), timeout=poll,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index, filepath, start = running.pop(future)
+                copies[index] -= 1
+                status = future.result()
+                if index in finished or (status.status != 'done' and copies[index]):
+                    continue
+                finished.add(index)
+                if status.status == 'done':
+                    seconds.append(status.seconds)
+                print("PROGRESS::Part {} {} after {} attempts in {:.1f}s".format(
+                    status.filepath, status.status, status.attempts,
+                    status.seconds))
+                yield status
+    finally:
+        executor.shutdown(wait=False)
+
+def async_dispatch_parts(batches,
+                         start = processor.start_filepaths_in_lambda,
+                         output_format = 'csv',
+                         window = 850, workers = 16, retries = 5,
+                         backoff = 1.0, timeout = 1200,
+                         speculate_percentile = 0.9,
+                         speculate_factor = 1.5,
+                         min_samples = 5, poll = 5.0):
+    """
+    Start batches of parts as asynchronous invocations, with at most window
+    batches in flight, and yield the PartStatus of each part once its
+    totals output is written. An asynchronous invoke returns as soon as
+    Lambda has queued the event, so starts take up to workers brief calls
+    at a time and nothing waits on a running function. Completion is
+    tracked by listing the totals folders every poll seconds, and a part's
+    seconds run from the start of its batch to the mtime of its totals.
+
+    Once every batch has started, free slots start a second copy of the
+    unfinished parts of batches running longer than speculate_factor times
+    the speculate_percentile of the part latencies so far. Parts still
+    without totals timeout seconds after their batch started are yielded
+    'timeout'.
+    """
+    batches = [list(batch) for batch in batches]
+    outputs = dict(
+        (f, tuple(io_handler.file_path_to_output_path(
+            f, 'totals', output_format).rsplit('/', 1)))
+        for batch in batches for f in batch)
+    folders = set(folder for folder, _ in outputs.values())
+    before = dict((folder, io_handler.list_folder(folder)) for folder in folders)
+    queue = deque(batches)
+    running = []
+    seconds = []
+
+    def landed(f, listings):
+        folder, name = outputs[f]
+        output, previous = listings[folder].get(name), before[folder].get(name)
+        if output is None or (previous is not None and
+                              (output['etag'], output['mtime']) ==
+                              (previous['etag'], previous['mtime'])):
+            return None
+        return output
+
+    while queue or running:
+        free = window - len(running) - sum(r['copies'] for r in running)
+        starting = [(queue.popleft(), None)
+                    for _ in range(min(max(free, 0), len(queue)))]
+        if not queue and len(seconds) >= min_samples:
+            threshold = speculate_factor * percentile(seconds,
+                                                      speculate_percentile)
+            now = time.time()
+            stragglers = sorted(
+                (r for r in running
+                 if not r['copies'] and now - r['started'] > threshold),
+                key=lambda r: r['started'])
+            for r in stragglers[:max(free - len(starting), 0)]:
+                print("PROGRESS::{} parts running for {:.1f}s, over {:.1f}s, "
+                      "starting a second copy".format(
+                          len(r['pending']), now - r['started'], threshold))
+                r['copies'] += 1
+                starting.append((sorted(r['pending']), r))
+        statuses = storage.thread_map(
+            lambda item: invoke_part(start, item[0], retries, backoff),
+            starting, workers)
+        for (batch, copy_of), status in zip(starting, statuses):
+            if copy_of is not None:
+                copy_of['attempts'] += status.attempts
+            elif status.status != 'done':
+                for f in batch:
+                    print("PROGRESS::Part {} {} after {} attempts: {}".format(
+                        f, status.status, status.attempts, status.error))
+                    yield status._replace(filepath=f)
+            else:
+                running.append({'pending': set(batch), 'copies': 0,
+                                'attempts': status.attempts,
+                                'started': time.time() - status.seconds})
+        if not running:
+            continue
+
+        time.sleep(poll)
+        listings = dict((folder, io_handler.list_folder(folder))
+                        for folder in folders)
+        now = time.time()
+        for r in list(running):
+            for f in sorted(r['pending']):
+                output = landed(f, listings)
+                if output is None:
+                    continue
+                r['pending'].discard(f)
+                status = PartStatus(f, 'done', r['attempts'],
+                                    max(output['mtime'] - r['started'], 0.0),
+                                    output, None)
+                seconds.append(status.seconds)
+                print("PROGRESS::Part {} done after {} attempts in {:.1f}s".format(
+                    f, status.attempts, status.seconds))
+                yield status
+            if r['pending'] and now - r['started'] > timeout:
+                for f in sorted(r['pending']):
+                    print("PROGRESS::Part {} timeout after {:.1f}s".format(
+                        f, now - r['started']))
+                    yield PartStatus(f, 'timeout', r['attempts'],
+                                     now - r['started'], None,
+                                     'no totals after {:.0f}s'.format(
+                                         now - r['started']))
+                r['pending'].clear()
+            if not r['pending']:
+                running.remove(r)
+
+def summarize_statuses(statuses):
+    """Print the parts per status and the latency percentiles of done parts."""
+    counts = Counter(s.status for s in statuses)
+    print("PROGRESS::{}".format(', '.join(
+        '{} {}'.format(n, status) for status, n in sorted(counts.items()))))
+    seconds = sorted(s.seconds for s in statuses if s.status == 'done')
+    if seconds:
+        print("PROGRESS::latency p50 {:.1f}s, p90 {:.1f}s, max {:.1f}s".format(
+            seconds[len(seconds) // 2],
+            seconds[int(len(seconds) * 0.9)],
+            seconds[-1]
+        ))
+    for s in statuses:
+        if s.status != 'done':
+            print("PROGRESS::{} {}: {}".format(s.filepath, s.status, s.error))
+    return counts
+
+# Rough processing time of a part of the mean size, to pack batches when
+# the processing rate is unknown.
+default_part_seconds = 5.0
+
+def seconds_per_byte(parts, seconds_per_megabyte = None):
+    """
+    The processing time per input byte of parts from discover_parts:
+    seconds_per_megabyte, or default_part_seconds for a part of their mean
+    size.
+    """
+    if seconds_per_megabyte is not None:
+        return seconds_per_megabyte / 1e6
+    mean_size = sum(part['size'] for part in parts) / float(max(len(parts), 1))
+    return default_part_seconds / max(mean_size, 1)
+
+def first_fit_decreasing(weights, capacity):
+    """
+    Pack the keys of weights into bins, heaviest first, each into the first
+    bin it fits within capacity. A key heavier than capacity gets a bin of
+    its own. Bins come out heaviest first, as lists of keys.
+    """
+    bins, loads = [], []
+    for key in sorted(weights, key=lambda k: (-weights[k], k)):
+        for i, load in enumerate(loads):
+            if load + weights[key] <= capacity:
+                bins[i].append(key)
+                loads[i] += weights[key]
+                break
+        else:
+            bins.append([key])
+            loads.append(weights[key])
+    return bins
+
+def pack_batches(parts, target_seconds = 120, seconds_per_megabyte = None):
+    """
+    Pack parts from discover_parts into batches of paths whose processing
+    time, estimated from their sizes, stays within target_seconds. A part
+    estimated over target_seconds gets a batch of its own.
+    """
+    return pack_by_size(parts, target_seconds /
+                        seconds_per_byte(parts, seconds_per_megabyte))
+
+def order_by_size(parts):
+    """The paths of parts from io_handler.discover_parts, largest first."""
+    return [part['path'] for part in
+            sorted(parts, key=lambda part: (-part['size'], part['path']))]
+
+def pack_by_size(parts, target_bytes):
+    """
+    Pack parts from io_handler.discover_parts into batches of paths of at
+    most target_bytes of input each.
+    """
+    return first_fit_decreasing(
+        dict((part['path'], part['size']) for part in parts), target_bytes)
+
+class LocalLambdaClient(object):
+    """
+    Stands in for the boto3 Lambda client when testing dispatch: invoke
+    runs process(event) in this process and answers like a synchronous
+    invocation, with a FunctionError if process raises, or for an 'Event'
+    InvocationType runs it on a background thread and answers 202 at
+    once. A throttle_rate share of calls is throttled, to exercise retries.
+    """
+    def __init__(self, process = None, throttle_rate = 0.0, seed = None):
+        self.process = process or processor.process_event
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+
+    def invoke(self, FunctionName, Payload,
+               InvocationType = 'RequestResponse'):
+        if self.random.random() < self.throttle_rate:
+            raise botocore.exceptions.ClientError(
+                {'Error': {'Code': 'TooManyRequestsException',
+                           'Message': 'Rate Exceeded.'}},
+                'Invoke'
+            )
+        if InvocationType == 'Event':
+            storage.BackgroundCall(self.process, json.loads(Payload))
+            return {'StatusCode': 202, 'Payload': io.BytesIO(b'')}
+        response = {'StatusCode': 200}
+        try:
+            result = self.process(json.loads(Payload))
+        except Exception as e:
+            response['FunctionError'] = 'Unhandled'
+            result = {'errorMessage': '{}'.format(e),
+                      'errorType': e.__class__.__name__}
+        response['Payload'] = io.BytesIO(json.dumps(result).encode('utf-8'))
+        return response
+
+def process_lambda(concurrency = 850, skip_processed = False,
+                   batch_seconds = None, limit = None):
+    """
+    Process parts in Lambda, largest first, one part per invocation, or
+    with batch_seconds in batches packed to about that runtime per
+    invocation. Invocations are asynchronous, with concurrency of them in
+    flight, and stragglers are started again once every part has started.
+    """
+    parts = discover_parts('s3://pydata-29/data', limit)
+    if skip_processed:
+        parts = unprocessed_parts(parts)
+    if batch_seconds:
+        batches = pack_batches(parts, batch_seconds)
+    else:
+        batches = [[filepath] for filepath in order_by_size(parts)]
+    statuses = list(async_dispatch_parts(batches, window=concurrency))
+    summarize_statuses(statuses)
+    return statuses
 
 if __name__ == '__main__':
     import sys
     architecture = sys.argv[1].strip() if len(sys.argv) >= 2 else 'local'
     concurrency = int(sys.argv[2]) if len(sys.argv) >= 3 else 801
+    skip_processed = len(sys.argv) >= 4 and sys.argv[3].strip() == 'skip'
+    batch_seconds = float(sys.argv[4]) if len(sys.argv) >= 5 else None
+    limit = int(sys.argv[5]) if len(sys.argv) >= 6 else None
     if  'lambda' in architecture:
-        res = process_lambda(concurrency)
+        res = process_lambda(concurrency, skip_processed, batch_seconds, limit)
     else:
-        res = process_locally()
+        res = process_locally(skip_processed, 'prefork' in architecture, limit)
     [r for r in res]
     print("Done")
 
@@ -1,13 +1,20 @@
 #!/usr/bin/env python
+import io
 import re
 import copy
 import json
+import time
 import boto3
+import multiprocessing
+import numpy
 import pandas
-from functools import reduce
 import io_handler
-from textblob import TextBlob
-from collections import Counter, defaultdict
+import storage
+from textblob.taggers import NLTKTagger
+from textblob.tokenizers import SentenceWordTokenizer
+from textblob.en import sentiment as pattern_sentiment
+from textblob._text import CompiledSentiment
+from collections import namedtuple
 
 s3 = io_handler.s3_client()
 lambda_client = io_handler.lambda_client()
@@ -26,20 +33,132 @@ gender_pronouns = {
 
 re_cleaner = re.compile(r"[^a-z]")
 
-def textblob_file_at_file_path(filepath):
-    df = io_handler.load_jsonl_as_pandas(filepath)
+tokenizer = SentenceWordTokenizer()
+tagger = NLTKTagger()
+sentiment = CompiledSentiment(pattern_sentiment)
+
+ArticleAnalysis = namedtuple('ArticleAnalysis',
+                             ['tags', 'polarity', 'subjectivity'])
+
+def sentiment_words(text):
+    """
+    The lower-case words pattern's Sentiment scores a text by: its own
+    find_tokens tokens, which keep emoticons, "(!)" and contractions such
+    as "wasn't" whole, unlike the Treebank tokens used for tagging.
+    """
+    return u' '.join(pattern_sentiment.tokenizer(text)).lower().split()
+
+def analyze_articles(texts):
+    """
+    Tag all articles in one lockstep batch and score their sentiment in
+    one batch, with the same results as TextBlob(text).tags and
+    TextBlob(text).sentiment.
+    """
+    words = [tokenizer.words(text) for text in texts]
+    tagged = tagger.tag_documents(words, tokenize=False)
+    scores = sentiment([sentiment_words(text) for text in texts])
+    return [ArticleAnalysis(tags, polarity, subjectivity)
+            for tags, (polarity, subjectivity) in zip(tagged, scores)]
+
+def analyze_article(text):
+    return analyze_articles([text])[0]
+
+warm_up_text = u"She said it was not a good day. He thinks it's really great!"
+
+def warm_models():
+    """
+    Load the tokenizer, tagger and sentiment models now rather than on the
+    first article, e.g. before forking workers that then share them.
+    """
+    len(pattern_sentiment)
+    analyze_article(warm_up_text)
+
+def analyze_shard(texts, connection):
+    connection.send(analyze_articles(texts))
+    connection.close()
+
+def analyze_articles_in_processes(texts, workers):
+    """
+    Analyze texts in workers shards of consecutive articles, each in a
+    process forked after warming the models, and return the analyses in
+    the order of texts. Results come back over pipes, as AWS Lambda has
+    no /dev/shm for multiprocessing.Pool and Queue.
+    """
+    warm_models()
+    texts = list(texts)
+    shard_size = -(-len(texts) // workers)
+    shards = []
+    for i in range(0, len(texts), shard_size):
+        receiver, sender = multiprocessing.Pipe(False)
+        process = multiprocessing.Process(target=analyze_shard,
+                                          args=(texts[i:i + shard_size], sender))
+        process.start()
+        sender.close()
+        shards.append((process, receiver))
+    analyses = []
+    for process, receiver in shards:
+        analyses.extend(receiver.recv())
+        process.join()
+    return analyses
+
+analysis_columns = ['id', 'tags', 'polarity', 'subjectivity', 'published']
+
+def analysis_frame(rows):
+    df = pandas.DataFrame(rows, columns=analysis_columns)
     df.index = df.id
-    df['blob'] = df.content.apply(TextBlob)
-    df['tags'] = df.blob.apply(lambda b: b.tags)
-    df['polarity'] = df.blob.apply(lambda b: b.sentiment.polarity)
-    df['subjectivity'] = df.blob.apply(lambda b: b.sentiment.subjectivity)
-    return df[['id', 'tags', 'polarity', 'subjectivity', 'published']]
+    return df
+
+def textblob_chunks_at_file_path(filepath, chunk_size=1000, stream=None,
+                                 workers=1):
+    """
+    Stream the part in chunks of chunk_size articles, so only one chunk of
+    raw articles is held in memory at a time, and yield the analysis of
+    each chunk as a DataFrame. stream is the part if it was already
+    downloaded. With several workers, each chunk is analyzed in that many
+    processes.
+    """
+    for chunk in io_handler.load_jsonl_chunks(filepath, chunk_size,
+                                              stream=stream):
+        if workers > 1:
+            analyses = analyze_articles_in_processes(chunk.content, workers)
+        else:
+            analyses = analyze_articles(chunk.content)
+        yield analysis_frame([(article_id, analysis.tags, analysis.polarity,
+                               analysis.subjectivity, published)
+                              for article_id, published, analysis in
+                              zip(chunk.id, chunk.published, analyses)])
+
+def textblob_file_at_file_path(filepath, chunk_size=1000, stream=None,
+                               workers=1):
+    """The analysis of the whole part as one DataFrame, with every tag."""
+    chunks = list(textblob_chunks_at_file_path(filepath, chunk_size, stream,
+                                               workers))
+    return pandas.concat(chunks) if chunks else analysis_frame([])
+
+def count_file_at_file_path(filepath, chunk_size=1000, stream=None,
+                            workers=1):
+    """
+    Return the per-article polarity, subjectivity and published DataFrame
+    of a part and its SparseCounts. Each chunk is counted as it is
+    analyzed and its tags dropped, so the tags of only one chunk are held
+    in memory at a time.
+    """
+    frames, counts = [], []
+    for df in textblob_chunks_at_file_path(filepath, chunk_size, stream,
+                                           workers):
+        counts.append(sparse_count_tags(df))
+        frames.append(df.drop('tags', 1))
+    if not frames:
+        frames.append(analysis_frame([]).drop('tags', 1))
+    return pandas.concat(frames), SparseCounts.concat(counts)
 
 def clean_token(tok):
     return re_cleaner.sub('', tok.lower())
 
+pronoun_tags = [u'PRP', u'PRP$', u'WP', u'WP$']
+
 def is_pronoun(tag):
-    return tag in ['PRP', 'PRP$', 'WP', 'WP$']
+    return tag in pronoun_tags
 
 def pronoun_gender(tok):
     return gender_pronouns.get(tok, 'neutral')
@@ -48,84 +167,490 @@ def positive_or_negative(polarity, subjectivity):
     is_positive = polarity > 0
     return 'positive' if is_positive else 'negative'
 
+genders = ['_male', '_female', '_neutral']
+sentiments = ['_negative', '_positive']
+
+class SparseCounts(namedtuple('SparseCounts',
+                               ['article_ids', 'keys', 'indptr', 'indices', 'data'])):
+    """
+    Per-article counts as a vocabulary of keys and CSR arrays, so memory
+    scales with the number of non-zero counts.
+
+    Article article_ids[i] counts data[j] of keys[indices[j]] for j in
+    range(indptr[i], indptr[i + 1]), with indices increasing in each row.
+    Keys are (token, tag) pairs and '_<gender>' and '_<sentiment>' strings,
+    in order of first appearance.
+    """
+    def vocabulary(self):
+        return dict((key, i) for i, key in enumerate(self.keys))
+
+    def column_sizes(self):
+        return numpy.bincount(self.indices, minlength=len(self.keys))
+
+    def totals(self):
+        """
+        The count of every key over all articles, as counts_df.sum() would
+        give: float unless every article counts every key.
+        """
+        totals = numpy.bincount(self.indices, weights=self.data,
+                                minlength=len(self.keys))
+        if (self.column_sizes() == len(self.article_ids)).all():
+            totals = totals.astype(numpy.int64)
+        return pandas.Series(totals, index=pandas.Index(
+            list(self.keys), dtype=object, tupleize_cols=False))
+
+    def to_df(self, keys=None):
+        """
+        A dense DataFrame of the counts of keys, all keys by default, the
+        same as a DataFrame.from_dict of per-article Counters: NaN where an
+        article has no count, and articles in the order the columns first
+        count them.
+        """
+        keys = self.keys if keys is None else keys
+        vocabulary = self.vocabulary()
+        columns = [vocabulary[key] for key in keys]
+        rows = numpy.repeat(numpy.arange(len(self.article_ids)),
+                            numpy.diff(self.indptr))
+        order = numpy.lexsort((numpy.arange(len(self.article_ids)),
+                               self.indices[self.indptr[:-1]]))
+
+        dense = numpy.zeros((len(self.article_ids), len(columns)))
+        selected = numpy.full(len(self.keys), -1, dtype=numpy.int64)
+        selected[columns] = numpy.arange(len(columns))
+        cells = selected[self.indices] >= 0
+        dense[rows[cells], selected[self.indices[cells]]] = self.data[cells]
+
+        df = pandas.DataFrame(
+            numpy.where(dense > 0, dense, numpy.nan),
+            index=list(self.article_ids),
+            columns=pandas.Index(list(keys), dtype=object, tupleize_cols=False)
+        )
+        sizes = self.column_sizes()[columns]
+        for i in numpy.flatnonzero(sizes == len(self.article_ids)):
+            df[df.columns[i]] = dense[:, i].astype(numpy.int64)
+        return df.iloc[order]
+
+    def to_npz(self):
+        """
+        Serialize the counts to the bytes of an .npz archive:
+
+        article_ids  the article ids, as text
+        key_tokens   the token of each (token, tag) key, or the aggregate key
+        key_tags     the tag of each (token, tag) key, or '' for aggregates
+        indptr       the CSR row pointers, one more than there are articles
+        indices      the key index of each count
+        data         the counts
+        """
+        arrays = {
+            'article_ids': io_handler.text_array(self.article_ids),
+            'key_tokens': io_handler.text_array(
+                [k[0] if isinstance(k, tuple) else k for k in self.keys]),
+            'key_tags': io_handler.text_array(
+                [k[1] if isinstance(k, tuple) else '' for k in self.keys]),
+            'indptr': numpy.asarray(self.indptr, dtype=numpy.int64),
+            'indices': numpy.asarray(self.indices, dtype=numpy.int64),
+            'data': numpy.asarray(self.data, dtype=numpy.int64),
+        }
+        buf = io.BytesIO()
+        numpy.savez_compressed(buf, **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def concat(cls, counts_list):
+        """
+        The counts of the articles of every SparseCounts in counts_list,
+        as sparse_count_tags counts a DataFrame of all their articles.
+        Counts of an article id in several of them are summed.
+        """
+        counts_list = [c for c in counts_list if len(c.article_ids)]
+        if not counts_list:
+            empty = numpy.array([], dtype=numpy.int64)
+            return cls([], [], numpy.zeros(1, dtype=numpy.int64), empty, empty)
+        if len(counts_list) == 1:
+            return counts_list[0]
+        article_index, key_index = {}, {}
+        rows, keys, groups, chunks, local_keys, data = [], [], [], [], [], []
+        for i, counts in enumerate(counts_list):
+            article_map = numpy.array(
+                [article_index.setdefault(a, len(article_index))
+                 for a in counts.article_ids], dtype=numpy.int64)
+            key_map = numpy.array(
+                [key_index.setdefault(k, len(key_index)) for k in counts.keys],
+                dtype=numpy.int64)
+            key_groups = numpy.array(
+                [0 if isinstance(k, tuple) else 1 if k in genders else 2
+                 for k in counts.keys], dtype=numpy.int64)
+            rows.append(article_map[numpy.repeat(
+                numpy.arange(len(counts.article_ids)), numpy.diff(counts.indptr))])
+            keys.append(key_map[counts.indices])
+            groups.append(key_groups[counts.indices])
+            chunks.append(numpy.repeat(i, len(counts.indices)))
+            local_keys.append(numpy.asarray(counts.indices, dtype=numpy.int64))
+            data.append(numpy.asarray(counts.data, dtype=numpy.int64))
+        rows, keys, groups, chunks, local_keys, data = [
+            numpy.concatenate(a)
+            for a in (rows, keys, groups, chunks, local_keys, data)]
+
+        # Keys are ordered by first appearance, as in sparse_count_tags: by
+        # article, then pairs, genders and sentiments, then as first seen.
+        order = numpy.lexsort((local_keys, chunks, groups, rows))
+        distinct, first = numpy.unique(keys[order], return_index=True)
+        distinct = distinct[numpy.argsort(first)]
+        columns = numpy.empty(len(key_index), dtype=numpy.int64)
+        columns[distinct] = numpy.arange(len(distinct))
+
+        n_keys = len(distinct)
+        cells, inverse = numpy.unique(rows * n_keys + columns[keys],
+                                      return_inverse=True)
+        sums = numpy.bincount(inverse, weights=data).astype(numpy.int64)
+        indptr = numpy.zeros(len(article_index) + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(cells // n_keys, minlength=len(article_index)),
+                     out=indptr[1:])
+        labels = dict((i, k) for k, i in key_index.items())
+        article_ids = sorted(article_index, key=article_index.get)
+        return cls(article_ids, [labels[k] for k in distinct], indptr,
+                   cells % n_keys, sums)
+
+    @classmethod
+    def from_npz(cls, data):
+        arrays = numpy.load(io.BytesIO(data))
+        keys = [(token, tag) if tag else token
+                for token, tag in zip(arrays['key_tokens'], arrays['key_tags'])]
+        return cls(list(arrays['article_ids']), keys, arrays['indptr'],
+                   arrays['indices'], arrays['data'])
+
+def sparse_count_tags(df):
+    """
+    Count the pronoun (token, tag) pairs, the '_<gender>' of each pronoun
+    and the '_<positive|negative>' sentiment of each article as
+    SparseCounts.
+
+    The tags of the whole part are exploded into flat arrays, pronouns are
+    selected with a mask, and tokens are cleaned and gendered once per
+    distinct token. Every count is then an (article, key) code, and the
+    distinct codes with their counts are the CSR arrays.
+    """
+    if not len(df):
+        empty = numpy.array([], dtype=numpy.int64)
+        return SparseCounts([], [], numpy.zeros(1, dtype=numpy.int64), empty, empty)
+    article_codes, article_ids = pandas.factorize(df.index)
+    lengths = numpy.array([len(t) for t in df.tags], dtype=numpy.int64)
+    tokens = numpy.array([tok for t in df.tags for tok, _ in t], dtype=object)
+    tags = numpy.array([tag for t in df.tags for _, tag in t], dtype=object)
+    rows = numpy.repeat(numpy.arange(len(df)), lengths)
+
+    mask = numpy.in1d(tags, pronoun_tags)
+    pronoun_positions = numpy.flatnonzero(mask)
+    pronoun_rows = rows[mask]
+    distinct, distinct_codes = numpy.unique(tokens[mask], return_inverse=True)
+    clean_codes, cleaned = pandas.factorize(
+        numpy.array([clean_token(tok) for tok in distinct], dtype=object))
+    clean_ids = clean_codes[distinct_codes]
+    tag_ids = pandas.Categorical(tags[mask], categories=pronoun_tags).codes
+    gender_ids = numpy.array(
+        [genders.index('_{}'.format(pronoun_gender(tok))) for tok in cleaned],
+        dtype=numpy.int64
+    )[clean_ids]
+
+    # Keys are numbered as (token, tag) pairs, then genders, then sentiments.
+    n_pairs = len(cleaned) * len(pronoun_tags)
+    pair_keys = clean_ids * len(pronoun_tags) + tag_ids
+    gender_keys = n_pairs + gender_ids
+    sentiment_keys = (n_pairs + len(genders) +
+                      (df.polarity.values > 0).astype(numpy.int64))
+
+    # Each article counts its pronouns, then their genders, then its
+    # sentiment, which sets the order the keys first appear in.
+    n_pronouns = len(pronoun_rows)
+    event_rows = numpy.concatenate([pronoun_rows, pronoun_rows,
+                                    numpy.arange(len(df))])
+    event_keys = numpy.concatenate([pair_keys, gender_keys, sentiment_keys])
+    event_groups = numpy.repeat([0, 1, 2], [n_pronouns, n_pronouns, len(df)])
+    event_positions = numpy.concatenate([pronoun_positions, pronoun_positions,
+                                         numpy.zeros(len(df), dtype=numpy.int64)])
+    event_articles = article_codes[event_rows]
+    order = numpy.lexsort((event_positions, event_groups, event_rows,
+                           event_articles))
+    keys, first = numpy.unique(event_keys[order], return_index=True)
+    keys = keys[numpy.argsort(first)]
+    columns = numpy.empty(n_pairs + len(genders) + len(sentiments),
+                          dtype=numpy.int64)
+    columns[keys] = numpy.arange(len(keys))
+
+    cells, data = numpy.unique(event_articles * len(keys) + columns[event_keys],
+                               return_counts=True)
+    indptr = numpy.zeros(len(article_ids) + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(cells // len(keys), minlength=len(article_ids)),
+                 out=indptr[1:])
+
+    labels = []
+    for key in keys:
+        if key < n_pairs:
+            labels.append((cleaned[key // len(pronoun_tags)],
+                           pronoun_tags[key % len(pronoun_tags)]))
+        elif key < n_pairs + len(genders):
+            labels.append(genders[key - n_pairs])
+        else:
+            labels.append(sentiments[key - n_pairs - len(genders)])
+
+    return SparseCounts(list(article_ids), labels, indptr,
+                        cells % len(keys), data)
+
+def is_aggregate(key):
+    return key.__class__ is ''.__class__ and key.startswith('_')
+
 def count_tags_in_df(df):
-    article_tag_count = defaultdict(Counter)
-    for article_id, row in df.iterrows():
-        tags = [(clean_token(tok), tag) for tok, tag in row.tags
-                if is_pronoun(tag)]
-        sentiment_agg = ['_{}'.format(
-            positive_or_negative(row.polarity, row.subjectivity)
-        )]
-        gender_agg = ['_{}'.format(pronoun_gender(t)) for t, _ in tags]
-        updates = tags + gender_agg + sentiment_agg
-        article_tag_count[article_id].update(updates)
-    counts_df = pandas.DataFrame.from_dict(article_tag_count, orient='index')
-    return counts_df
-
-def process_part(part_filepath):
-    part = io_handler.describe_file_path(part_filepath)
-    print("PROGRESS::Processing part {}...".format(part['name']))
-    df = textblob_file_at_file_path(part_filepath)
-    counts_df = count_tags_in_df(df)
-    per_article_agg_cols = [c for c in counts_df.columns.values
-                            if c.__class__ is ''.__class__ and
-                               c.startswith('_')]
-    merged = pandas.merge(df, counts_df[per_article_agg_cols],
+    """The dense DataFrame of sparse_count_tags(df)."""
+    return sparse_count_tags(df).to_df()
+
+def part_results(part_filepath, stream=None, workers=1):
+    """Return the per-article DataFrame and the totals Series of a part."""
+    df, counts = count_file_at_file_path(part_filepath, stream=stream,
+                                         workers=workers)
+    per_article_agg_cols = [c for c in counts.keys if is_aggregate(c)]
+    merged = pandas.merge(df, counts.to_df(per_article_agg_cols),
                           right_index=True, left_index=True, how='outer')
     columns_to_drop = [c for c in merged.columns.values
                        if c not in ['polarity', 'subjectivity', 'published'] + per_article_agg_cols]
     per_article_df = merged.drop(columns_to_drop, 1)
-    totals_series = counts_df.sum()
+    totals_series = counts.totals()
+    return per_article_df, totals_series
 
-    root_parent = part['root_parent']
-    article_file_name = '{}/articles/{}'.format(root_parent, part['name'])
-    totals_file_name = '{}/totals/{}'.format(root_parent, part['name'])
+def write_part_results(part_filepath, per_article_df, totals_series,
+                       output_format='csv'):
+    article_file_name = io_handler.file_path_to_output_path(
+        part_filepath, 'articles', output_format)
+    totals_file_name = io_handler.file_path_to_output_path(
+        part_filepath, 'totals', output_format)
 
     io_handler.write_pandas_to_csv(per_article_df, article_file_name,
                                    {'index_label' : 'id',
                                     'index' : True,
-                                    'sep' : ';'})
+                                    'sep' : ';'},
+                                   output_format)
     io_handler.write_pandas_to_csv(totals_series, totals_file_name,
                                    {'index_label' : 'agg',
                                     'header' : ['count'],
                                     'index' : True,
-                                    'sep' : ';'})
+                                    'sep' : ';'},
+                                   output_format)
+
+def process_part(part_filepath, output_format='csv', workers=1):
+    part = io_handler.describe_file_path(part_filepath)
+    print("PROGRESS::Processing part {}...".format(part['name']))
+    per_article_df, totals_series = part_results(part_filepath, workers=workers)
+    write_part_results(part_filepath, per_article_df, totals_series,
+                       output_format)
 
     print("PROGRESS::Processed part {}!".format(part['name']))
 
+def timed_stage(result, stage, fn, *args):
+    start = time.time()
+    try:
+        return fn(*args)
+    finally:
+        result['stages'][stage] = time.time() - start
+
+def process_parts(filepaths, output_format='csv', prefetch=1, workers=1):
+    """
+    Process parts as a pipeline and return the status of each, with the
+    seconds it spent in each stage. While a part is analysed, the next
+    prefetch parts download to temporary files and earlier parts' outputs
+    upload on background threads, so network time hides behind analysis
+    while only a chunk of each part is in memory. A failing part does not
+    stop the rest of the batch.
+    """
+    start = time.time()
+    results = [{'filepath': f, 'stages': {}} for f in filepaths]
+    downloads = {}
+    uploads = []
+    prefetch = max(prefetch, 1)
+
+    def download(i):
+        if i < len(results):
+            downloads[i] = storage.BackgroundCall(
+                timed_stage, results[i], 'download',
+                io_handler.download_file_path, results[i]['filepath'])
+
+    def fail(result, e):
+        print("PROGRESS::Failed part {}: {}".format(result['filepath'], e))
+        result['status'] = 'failed'
+        result['error'] = '{}: {}'.format(e.__class__.__name__, e)
+
+    for i in range(prefetch):
+        download(i)
+    for i, result in enumerate(results):
+        download(i + prefetch)
+        filepath = result['filepath']
+        stream = None
+        try:
+            stream = downloads.pop(i).result()
+            per_article_df, totals_series = timed_stage(
+                result, 'compute', part_results, filepath, stream, workers)
+        except Exception as e:
+            fail(result, e)
+            continue
+        finally:
+            if stream is not None:
+                stream.close()
+        uploads.append((result, storage.BackgroundCall(
+            timed_stage, result, 'upload', write_part_results,
+            filepath, per_article_df, totals_series, output_format)))
+
+    for result, upload in uploads:
+        try:
+            upload.result()
+            result['status'] = 'done'
+        except Exception as e:
+            fail(result, e)
+
+    for result in results:
+        result['seconds'] = sum(result['stages'].values())
+    stages = dict((stage, sum(r['stages'].get(stage, 0) for r in results))
+                  for stage in ['download', 'compute', 'upload'])
+    print("PROGRESS::{} parts in {:.1f}s: download {:.1f}s, compute {:.1f}s, "
+          "upload {:.1f}s".format(len(results), time.time() - start,
+                                  stages['download'], stages['compute'],
+                                  stages['upload']))
+    return results
+
+def process_event(event):
+    """
+    Process the part at event['filepath'], or every part in
+    event['filepaths'] with the status of each under 'parts', analyzing
+    each part in event['workers'] processes.
+    """
+    output_format = event.get('output_format', 'csv')
+    workers = event.get('workers', 1)
+    if 'filepaths' in event:
+        return {'parts': process_parts(event['filepaths'], output_format,
+                                       workers=workers)}
+    start = time.time()
+    process_part(event['filepath'], output_format, workers)
+    return {
+        'filepath': event['filepath'],
+        'seconds': time.time() - start,
+    }
+
 def add_series(a, b):
     return a.add(b, fill_value=0)
 
+def common_name(names):
+    names = set(names)
+    return names.pop() if len(names) == 1 else None
+
+def sum_series(series_list):
+    """
+    Sum Series over the union of their indexes, skipping None.
+
+    The labels of all Series are factorized together once against the
+    shared index, and the values summed into it with one bincount, instead
+    of aligning two indexes at every pairwise add. Like add_series with
+    fill_value=0, the result is float, sorted when the labels are
+    comparable, and keeps the name and index name the Series share.
+    """
+    series_list = [s for s in series_list if s is not None]
+    if not series_list:
+        return pandas.Series([], dtype=numpy.float64)
+    labels = numpy.concatenate([numpy.asarray(s.index, dtype=object)
+                                for s in series_list])
+    values = numpy.concatenate([numpy.asarray(s.values, dtype=numpy.float64)
+                                for s in series_list])
+    codes, keys = pandas.factorize(labels)
+    totals = pandas.Series(
+        numpy.bincount(codes, weights=values, minlength=len(keys)),
+        index=pandas.Index(list(keys), dtype=object, tupleize_cols=False,
+                           name=common_name(s.index.name for s in series_list)),
+        name=common_name(s.name for s in series_list)
+    )
+    try:
+        return totals.sort_index()
+    except TypeError:
+        return totals
+
 def reduce_series_list(series_list):
-    return reduce(add_series, series_list)
+    return sum_series(series_list)
 
 def concat_dataframe_list(df_list):
     return pandas.concat(df_list)
 
+class LambdaFunctionError(Exception):
+    pass
+
+def invoke_lambda(payload_dict, lambda_arn = default_lambda_arn, client = None):
+    """
+    Invoke the function synchronously and return the handler's result,
+    raising LambdaFunctionError if the handler failed.
+    """
+    response = (client or lambda_client).invoke(
+        FunctionName = lambda_arn,
+        Payload      = json.dumps(payload_dict)
+    )
+    result = json.loads(response['Payload'].read().decode('utf-8') or 'null')
+    if response.get('FunctionError'):
+        raise LambdaFunctionError('{}: {}'.format(
+            response['FunctionError'],
+            result.get('errorMessage') if isinstance(result, dict) else result
+        ))
+    return result
+
+def start_lambda(payload_dict, lambda_arn = default_lambda_arn, client = None):
+    """
+    Invoke the function asynchronously: Lambda queues the event and runs
+    it with no caller waiting, so there is no result. Raises
+    LambdaFunctionError if the event was not queued.
+    """
+    response = (client or lambda_client).invoke(
+        FunctionName   = lambda_arn,
+        InvocationType = 'Event',
+        Payload        = json.dumps(payload_dict)
+    )
+    if response.get('StatusCode') != 202:
+        raise LambdaFunctionError('Event not queued, status {}'.format(
+            response.get('StatusCode')))
+
 def process_filepath_in_lambda(filepath,
-                               lambda_arn = default_lambda_arn):
+                               lambda_arn = default_lambda_arn,
+                               output_format = 'csv',
+                               client = None,
+                               workers = 1):
     payload_dict = {
       "filepath": filepath,
+      "output_format": output_format,
+      "workers": workers,
     }
     payload = json.dumps(payload_dict)
 
     print('PROGRESS::Calling lambda with {} payload'.format(payload))
-    lambda_client.invoke(
-        FunctionName = lambda_arn,
-        Payload      = payload
-    )
+    result = invoke_lambda(payload_dict, lambda_arn, client)
     print('PROGRESS::Job with payload {}, done.'.format(payload))
-    return 'done'
+    return result
+
+def start_filepaths_in_lambda(filepaths,
+                              lambda_arn = default_lambda_arn,
+                              output_format = 'csv',
+                              client = None,
+                              workers = 1):
+    """
+    Start processing a batch of parts in one asynchronous invocation. Each
+    part is done once its outputs are written.
+    """
+    payload_dict = {
+      "filepaths": list(filepaths),
+      "output_format": output_format,
+      "workers": workers,
+    }
+    start_lambda(payload_dict, lambda_arn, client)
 
 if __name__ == '__main__':
     from pprint import PrettyPrinter
     pp = PrettyPrinter()
     import random
-    filepaths = io_handler.list_file_paths(data_root='s3://pydata-29/data')
-    # filepaths = io_handler.list_file_paths()
+    parts = io_handler.discover_parts(data_root='s3://pydata-29/data')
+    # parts = io_handler.discover_parts()
 
     pp.pprint('...Process one part...')
-    filepath = filepaths[random.choice(range(10000))]
+    filepath = random.choice(parts)['path']
     io_handler.describe_file_path(filepath)
 
     process_part(filepath)
@@ -135,7 +660,7 @@ if __name__ == '__main__':
         import setup
         from processor import *
 
-        filepaths = io_handler.list_file_paths()
+        filepaths = [part['path'] for part in io_handler.discover_parts()]
 
         pp.pprint('...Textblobbing file at filepath...')
         filepath = filepaths[0]
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""
+Object storage backends for io_handler: S3 through boto3, and a directory
+that stands in for S3 offline, with one subdirectory per bucket. Both
+answer get/open/put/head/list on (bucket, key) locations, with ranged
+gets and threaded batch gets and puts.
+"""
+import os
+import calendar
+import tempfile
+import threading
+import botocore.exceptions
+
+# The mode open() gives new files. Temporary files are created 0600.
+umask = os.umask(0)
+os.umask(umask)
+file_mode = 0o666 & ~umask
+
+class ObjectNotFound(Exception):
+    pass
+
+class BackgroundCall(object):
+    """
+    Call fn(*args) on a background thread. result() waits for the call
+    and returns its value, or raises its exception. The Lambda runtime is
+    python2.7, without concurrent.futures, so this stands in for its
+    thread pool futures.
+    """
+    def __init__(self, fn, *args):
+        self.value = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, args=(fn, args))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self, fn, args):
+        try:
+            self.value = fn(*args)
+        except Exception as e:
+            self.error = e
+
+    def result(self):
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+def thread_map(fn, items, workers=16):
+    """
+    Map fn over items on up to workers background calls and return the
+    results in order. After a failure no new items start, and the first
+    error is raised once every call has finished.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    failed = []
+    pending = iter(enumerate(items))
+    lock = threading.Lock()
+
+    def work():
+        while not failed:
+            with lock:
+                try:
+                    i, item = next(pending)
+                except StopIteration:
+                    return
+            try:
+                results[i] = fn(item)
+            except Exception:
+                failed.append(i)
+                raise
+
+    calls = [BackgroundCall(work) for _ in range(min(workers, len(items)))]
+    for call in calls:
+        call.thread.join()
+    for call in calls:
+        call.result()
+    return results
+
+class Storage(object):
+    """
+    The operations every backend implements, and the batch operations
+    built on them.
+
+    get(bucket, key, start=None, end=None)  the bytes of an object, or
+                                            of bytes start to end included
+    open(bucket, key)                       an object as a binary stream
+    put(bucket, key, data)                  write an object
+    head(bucket, key)                       describe an object, or None
+    list(bucket, prefix)                    describe the objects whose keys
+                                            start with prefix, without
+                                            descending past a '/'
+
+    Objects are described as dicts of key, size, etag and mtime in seconds
+    since the epoch. get and open raise ObjectNotFound for a missing key.
+    """
+    def get_many(self, bucket, keys, workers=16):
+        """The bytes of each key, None where the object is missing."""
+        def get(key):
+            try:
+                return self.get(bucket, key)
+            except ObjectNotFound:
+                return None
+        return thread_map(get, keys, workers)
+
+    def put_many(self, bucket, items, workers=16):
+        """Write each (key, data) of items."""
+        thread_map(lambda item: self.put(bucket, *item), items, workers)
+
+class S3Storage(Storage):
+    def __init__(self, client):
+        self.client = client
+
+    def get_object(self, bucket, key, **options):
+        try:
+            return self.client.get_object(Bucket=bucket, Key=key, **options)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise ObjectNotFound('s3://{}/{}'.format(bucket, key))
+            raise
+
+    def get(self, bucket, key, start=None, end=None):
+        options = {}
+        if start is not None or end is not None:
+            options['Range'] = 'bytes={}-{}'.format(
+                start or 0, '' if end is None else end)
+        return self.get_object(bucket, key, **options)['Body'].read()
+
+    def open(self, bucket, key):
+        return self.get_object(bucket, key)['Body']
+
+    def put(self, bucket, key, data):
+        self.client.put_object(Body=data, Bucket=bucket, Key=key)
+
+    def describe(self, key, obj):
+        return {
+            'key': key,
+            'size': obj.get('Size', obj.get('ContentLength')),
+            'etag': obj['ETag'].strip('"'),
+            'mtime': calendar.timegm(obj['LastModified'].utctimetuple()),
+        }
+
+    def head(self, bucket, key):
+        try:
+            return self.describe(key, self.client.head_object(Bucket=bucket,
+                                                              Key=key))
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+
+    def list(self, bucket, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix,
+                                       Delimiter='/'):
+            for obj in page.get('Contents', []):
+                yield self.describe(obj['Key'], obj)
+
+class DirectoryStorage(Storage):
+    """
+    Objects as files under root/bucket/key. With an empty root and bucket,
+    keys are plain local paths.
+    """
+    def __init__(self, root=''):
+        self.root = root
+
+    def path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+
+    def open(self, bucket, key):
+        try:
+            return open(self.path(bucket, key), 'rb')
+        except IOError:
+            raise ObjectNotFound(self.path(bucket, key))
+
+    def get(self, bucket, key, start=None, end=None):
+        with self.open(bucket, key) as f:
+            f.seek(start or 0)
+            if end is None:
+                return f.read()
+            return f.read(max(end + 1 - (start or 0), 0))
+
+    def put(self, bucket, key, data):
+        path = self.path(bucket, key)
+        folder = os.path.dirname(path) or '.'
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # Already there, or made by a concurrent put.
+            if not os.path.isdir(folder):
+                raise
+        # Write next to the target and rename over it, so readers never
+        # see a partly written file.
+        with tempfile.NamedTemporaryFile(dir=folder, delete=False) as f:
+            f.write(data)
+        os.chmod(f.name, file_mode)
+        os.rename(f.name, path)
+
+    def describe(self, key, path):
+        stat = os.stat(path)
+        return {
+            'key': key,
+            'size': stat.st_size,
+            'etag': None,
+            'mtime': stat.st_mtime,
+        }
+
+    def head(self, bucket, key):
+        path = self.path(bucket, key)
+        return self.describe(key, path) if os.path.isfile(path) else None
+
+    def list(self, bucket, prefix=''):
+        folder, _, name_prefix = prefix.rpartition('/')
+        folder_path = self.path(bucket, folder)
+        if not os.path.isdir(folder_path or '.'):
+            return
+        for file_name in sorted(os.listdir(folder_path or '.')):
+            path = os.path.join(folder_path, file_name)
+            if file_name.startswith(name_prefix) and os.path.isfile(path):
+                key = '{}/{}'.format(folder, file_name) if folder else file_name
+                yield self.describe(key, path)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from textblob.en import sentiment
+from textblob.sentiments import PatternAnalyzer
+from textblob._text import CompiledSentiment
+
+TEXTS = [
+    u"The food was not very good, but the service was really excellent!",
+    u"What a terrible, terrible day :( I am not happy at all.",
+    u"Nothing to see here.",
+    u"",
+    u"This is somewhat nice (!) and incredibly boring :-)",
+    u"I don't think it's bad. It is not a bad idea, really.",
+    u"Great!!! Simply the best thing ever ;)",
+    u"ok",
+]
+
+
+def pattern_words(text):
+    return u' '.join(sentiment.tokenizer(text)).lower().split()
+
+
+class CompiledSentimentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = PatternAnalyzer()
+
+    def assertMatchesAnalyzer(self, texts):
+        compiled = CompiledSentiment(sentiment)
+        expected = [tuple(self.analyzer.analyze(t)) for t in texts]
+        self.assertEqual(compiled([pattern_words(t) for t in texts]), expected)
+
+    def test_batch_matches_analyzer(self):
+        self.assertMatchesAnalyzer(TEXTS)
+
+    def test_batch_in_other_orders_matches_analyzer(self):
+        self.assertMatchesAnalyzer(TEXTS[::-1])
+        self.assertMatchesAnalyzer(sorted(TEXTS, key=len))
+
+    def test_single_text_matches_analyzer(self):
+        for text in TEXTS:
+            self.assertMatchesAnalyzer([text])
+
+    def test_ids_are_reused_across_batches(self):
+        compiled = CompiledSentiment(sentiment)
+        words = [pattern_words(t) for t in TEXTS]
+        first = compiled(words)
+        n_ids = len(compiled.ids)
+        self.assertEqual(compiled(words), first)
+        self.assertEqual(len(compiled.ids), n_ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
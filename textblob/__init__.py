@@ -6,8 +6,6 @@ __author__ = 'Steven Loria'
 
 PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-from .blob import TextBlob, Word, Sentence, Blobber, WordList
-
 __all__ = [
     'TextBlob',
     'Word',
@@ -15,3 +13,27 @@ __all__ = [
     'Blobber',
     'WordList',
 ]
+
+if os.environ.get('TEXTBLOB_LAZY_IMPORT'):
+    # Import textblob.blob, and with it every model textblob supports, only
+    # when one of its classes is used, so importing a single textblob
+    # module such as textblob.taggers stays cheap.
+    import sys
+    import types
+
+    class _LazyTextBlobModule(types.ModuleType):
+        def __getattr__(self, name):
+            if name not in __all__:
+                raise AttributeError(name)
+            from textblob import blob
+            value = getattr(blob, name)
+            setattr(self, name, value)
+            return value
+
+    # Keep a reference to this module, so its globals outlive the swap.
+    _lazy_module = _LazyTextBlobModule(__name__, __doc__)
+    _lazy_module.__dict__.update(globals())
+    _lazy_module._eager_module = sys.modules[__name__]
+    sys.modules[__name__] = _lazy_module
+else:
+    from .blob import TextBlob, Word, Sentence, Blobber, WordList
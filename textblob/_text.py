@@ -11,8 +11,14 @@ from itertools import chain
 import types
 import os
 import re
+import marshal
 from xml.etree import cElementTree
 
+try:
+    import numpy
+except ImportError:
+    pass
+
 from .compat import text_type, basestring, imap, unicode, binary_type, PY2
 
 try:
@@ -775,6 +781,27 @@ class Sentiment(lazydict):
         dict.update(self.labeler, labels)
         dict.update(self._synsets, synsets)
 
+    def save_snapshot(self, path):
+        """ Writes the loaded words, labels and synsets to a marshal snapshot at the given path,
+            which Sentiment.load_snapshot() reads back without parsing and averaging the XML-file.
+            Marshal format version 2 is used, which both Python 2 and 3 can read.
+        """
+        if dict.__len__(self) == 0:
+            self.load()
+        snapshot = (self._language, dict(dict.items(self)), self.labeler, self._synsets)
+        with open(path, "wb") as f:
+            marshal.dump(snapshot, f, 2)
+
+    def load_snapshot(self, path):
+        """ Loads the words, labels and synsets from a snapshot written by Sentiment.save_snapshot().
+        """
+        with open(path, "rb") as f:
+            language, words, labels, synsets = marshal.load(f)
+        self._language = language or self._language
+        dict.update(self, words)
+        dict.update(self.labeler, labels)
+        dict.update(self._synsets, synsets)
+
     def synset(self, id, pos=ADJECTIVE):
         """ Returns a (polarity, subjectivity)-tuple for the given synset id.
             For example, the adjective "horrible" has id 193480 in WordNet:
@@ -936,6 +963,152 @@ class Sentiment(lazydict):
         if label:
             self.labeler[word] = label
 
+class CompiledSentiment(object):
+
+    def __init__(self, sentiment):
+        """ Scores batches of tokenized texts against a Sentiment lexicon, with the same results
+            as Sentiment(list_of_lowercase_words), i.e. the same negation, modifier, exclamation,
+            sarcasm and emoticon rules as Sentiment.assessments().
+            Each distinct token that can be assessed is given an integer id on first sight,
+            with its scores and flags held in lists indexed by id.
+            Other tokens are given no id, so the table is bounded by the lexicon.
+            Requires numpy.
+        """
+        self.sentiment = sentiment
+        self.ids = {}
+        self._columns = dict((k, []) for k in self.COLUMNS)
+        # Emoticons in lowercase, with the polarity of the first type that has them,
+        # as found by Sentiment.assessments().
+        self._emoticons = {}
+        for (type, polarity), emoticons in EMOTICONS.items():
+            for e in emoticons:
+                self._emoticons.setdefault(e.lower(), polarity)
+
+    COLUMNS = (
+        "known",         # Token is in the lexicon.
+        "polarity",      # Lexicon scores of known tokens.
+        "subjectivity",
+        "intensity",
+        "modifier",      # Known token is an adverb that modifies the next word.
+        "modifies",      # Sentiment.modifier(token), e.g., ends with -ly.
+        "negation",      # Token is a negation ("not").
+        "exclamation",   # Token is "!".
+        "irony",         # Token is the sarcasm mark "(!)".
+        "emoticon",      # Token is an emoticon.
+        "emoticon_polarity",
+    )
+
+    def _id(self, w):
+        """ Returns the id of the given token, assessing it on first sight,
+            or -1 if it is not a known word, negation, "!", "(!)" or emoticon.
+        """
+        w = w.lower()
+        id = self.ids.get(w)
+        if id is not None:
+            return id
+        lexicon = self.sentiment
+        known = w in lexicon and None in lexicon[w]
+        emoticon = None
+        if not known and w.isalpha() is False and len(w) <= 5 and w not in PUNCTUATION:
+            emoticon = self._emoticons.get(w)
+        negation = w in lexicon.negations
+        if not (known or negation or emoticon is not None or w in ("!", "(!)")):
+            return -1
+        p, s, i = lexicon[w][None] if known else (0.0, 0.0, 1.0)
+        for k, v in zip(self.COLUMNS, (
+                known, p, s, i,
+                known and any(map(lexicon[w].__contains__, lexicon.modifiers)),
+                bool(lexicon.modifier(w)),
+                negation,
+                w == "!",
+                w == "(!)",
+                emoticon is not None,
+                emoticon or 0.0)):
+            self._columns[k].append(v)
+        id = self.ids[w] = len(self.ids)
+        return id
+
+    def __call__(self, texts):
+        """ Returns a list of (polarity, subjectivity)-tuples, one for each list of words in texts.
+        """
+        texts = [list(t) for t in texts]
+        words = [w for t in texts for w in t]
+        ids = numpy.array([self._id(w) for w in words], dtype=int)
+        lengths = numpy.array([len(t) for t in texts], dtype=int)
+        doc = numpy.repeat(numpy.arange(len(texts)), lengths)
+        # Whether each token ends a retained negation ("not a good") or modifier ("really is a good").
+        drops_negation = numpy.array([len(w.strip("'")) > 1 for w in words], dtype=bool)
+        drops_modifier = numpy.array([len(w) > 2 for w in words], dtype=bool)
+        # Tokens without an id can only end a retained negation or modifier.
+        # Count those between each remaining token and the one before it.
+        active = ids >= 0
+        passive = ~active
+        drops_n = numpy.cumsum(passive & drops_negation)
+        drops_m = numpy.cumsum(passive & drops_modifier)
+        positions = numpy.flatnonzero(active)
+        if len(positions) > 0:
+            previous = numpy.concatenate(([-1], positions[:-1]))
+            new_doc = numpy.concatenate(([True], doc[positions[1:]] != doc[positions[:-1]]))
+            before = numpy.maximum(positions - 1, 0)
+            drop_n = (drops_n[before] - drops_n[numpy.maximum(previous, 0)]) > 0
+            drop_m = (drops_m[before] - drops_m[numpy.maximum(previous, 0)]) > 0
+        else:
+            new_doc = drop_n = drop_m = positions
+        # Assessments are kept in flat lists, with the text they belong to.
+        A, P, S, I, N = [], [], [], [], []
+        known, polarity, subjectivity, intensity, modifier, modifies, negation, \
+        exclamation, irony, emoticon, emoticon_polarity = \
+            [self._columns[k] for k in self.COLUMNS]
+        first = 0  # Index of the first assessment of the current text.
+        m = n = None
+        for id, d, new, dn, dm, ends_n, ends_m in zip(
+          ids[positions].tolist(), doc[positions].tolist(), new_doc.tolist(),
+          drop_n.tolist(), drop_m.tolist(),
+          drops_negation[positions].tolist(), drops_modifier[positions].tolist()):
+            if new:
+                m = n = None
+                first = len(A)
+            if dn:
+                n = None
+            if dm:
+                m = None
+            if known[id]:
+                p, s, i = polarity[id], subjectivity[id], intensity[id]
+                if m is None:
+                    A.append(d); P.append(p); S.append(s); I.append(i); N.append(1)
+                if m is not None:
+                    P[-1] = max(-1.0, min(p * I[-1], +1.0))
+                    S[-1] = max(-1.0, min(s * I[-1], +1.0))
+                    I[-1] = i
+                if n is not None:
+                    I[-1] = 1.0 / I[-1]
+                    N[-1] = -1
+                m = id if modifier[id] else None
+                n = id if negation[id] else None
+            else:
+                if negation[id]:
+                    n = id
+                elif n is not None and ends_n:
+                    n = None
+                if n is not None and m is not None and modifies[m]:
+                    N[-1] = -1
+                    n = None
+                elif m is not None and ends_m:
+                    m = None
+                if exclamation[id] and len(A) > first:
+                    P[-1] = max(-1.0, min(P[-1] * 1.25, +1.0))
+                if irony[id]:
+                    A.append(d); P.append(0.0); S.append(1.0); I.append(1.0); N.append(1)
+                if emoticon[id]:
+                    A.append(d); P.append(emoticon_polarity[id]); S.append(1.0); I.append(1.0); N.append(1)
+        # "not good" = slightly bad, "not bad" = slightly good.
+        P = [v * -0.5 if sign < 0 else v for v, sign in zip(P, N)]
+        count = numpy.bincount(A, minlength=len(texts)).astype(float)
+        count[count == 0] = 1
+        P = numpy.bincount(A, weights=P, minlength=len(texts)) / count
+        S = numpy.bincount(A, weights=S, minlength=len(texts)) / count
+        return list(zip(P.tolist(), S.tolist()))
+
 #--- PART-OF-SPEECH TAGGER -------------------------------------------------------------------------
 
 # Unknown words are recognized as numbers if they contain only digits and -,.:/%$
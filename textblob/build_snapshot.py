@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Builds the precompiled sentiment lexicon snapshot for TextBlob.
+
+Usage: ::
+
+    $ python -m textblob.build_snapshot
+
+The snapshot holds the English sentiment lexicon after the word senses in
+``en-sentiment.xml`` have been averaged and the ``-ly`` adverbs derived, so
+the default ``PatternAnalyzer`` can load it without parsing the XML-file.
+Rebuild it whenever ``en-sentiment.xml`` changes.
+"""
+import sys
+from textblob.en import Sentiment, sentiment
+
+
+def build(path=None):
+    path = path or sentiment._snapshot
+    # A lexicon without a snapshot, so it is derived from the XML-file.
+    lexicon = Sentiment(path=sentiment.path, synset="wordnet_id")
+    lexicon.save_snapshot(path)
+    return path
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    print("Wrote {0}".format(build(path)))
+
+if __name__ == '__main__':
+    main()
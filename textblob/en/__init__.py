@@ -50,7 +50,18 @@ class Parser(_Parser):
 
 class Sentiment(_Sentiment):
 
+    def __init__(self, path="", language=None, synset=None, confidence=None, **kwargs):
+        """ An optional snapshot path can be given, as written by Sentiment.save_snapshot().
+            If the file exists, the default lexicon is loaded from it instead of the XML-file.
+        """
+        _Sentiment.__init__(self, path, language, synset, confidence, **kwargs)
+        self._snapshot = kwargs.get("snapshot")
+
     def load(self, path=None):
+        # The snapshot already includes the derived adverbs.
+        if not path and self._snapshot and os.path.exists(self._snapshot):
+            self.load_snapshot(self._snapshot)
+            return
         _Sentiment.load(self, path)
         # Map "terrible" to adverb "terribly" (+1% accuracy)
         if not path:
@@ -84,7 +95,8 @@ sentiment = Sentiment(
    modifiers = ("RB",),
    modifier  = lambda w: w.endswith("ly"),
    tokenizer = parser.find_tokens,
-    language = "en"
+    language = "en",
+    snapshot = os.path.join(MODULE, "en-sentiment.marshal")
 )
 
 
@@ -33,3 +33,12 @@ class NLTKTagger(BaseTagger):
             text = list(word_tokenize(text))
         tagged = nltk.tag.pos_tag(text)
         return tagged
+
+    @requires_nltk_corpus
+    def tag_documents(self, texts, tokenize=True):
+        """Tag a sequence of strings `texts` in one batch, sharing a single
+        loaded tagger. Returns one list of (word, tag) tuples per text.
+        """
+        if tokenize:
+            texts = [list(word_tokenize(text)) for text in texts]
+        return nltk.tag.tag_documents(texts)
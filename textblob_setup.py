@@ -1,9 +1,72 @@
 #!/usr/bin/env python
+"""
+Point NLTK at the models the pipeline uses, downloading them only when
+they are not already there.
+
+Build a deployment package with the models bundled in nltk_data/, so no
+container downloads them: ::
+
+    $ python textblob_setup.py bundle
+"""
 import os
-os.environ['NLTK_DATA'] = '/tmp'
-from textblob import download_corpora
+import sys
+
+# The corpora processor uses: punkt for sentences, and the tagger.
+REQUIRED_CORPORA = ['punkt', 'averaged_perceptron_tagger']
+
+# The files of REQUIRED_CORPORA loaded under each python version.
+REQUIRED_FILES = {
+    2: ['tokenizers/punkt/english.pickle',
+        'taggers/averaged_perceptron_tagger/averaged_perceptron_tagger.pickle'],
+    3: ['tokenizers/punkt/PY3/english.pickle',
+        'taggers/averaged_perceptron_tagger/averaged_perceptron_tagger.pickle'],
+}
+
+BUNDLED_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'nltk_data')
+DOWNLOADED_DATA = '/tmp'
+
+def has_required_files(data_dir):
+    return all(os.path.isfile(os.path.join(data_dir, f))
+               for f in REQUIRED_FILES[sys.version_info[0]])
+
+# NLTK reads NLTK_DATA when it is first imported.
+NLTK_DATA = BUNDLED_DATA if has_required_files(BUNDLED_DATA) else DOWNLOADED_DATA
+os.environ['NLTK_DATA'] = NLTK_DATA
+
+# Only import the parts of nltk and textblob the handler uses.
+os.environ.setdefault('NLTK_LAZY_IMPORT', '1')
+os.environ.setdefault('TEXTBLOB_LAZY_IMPORT', '1')
 
 def setup():
+    if has_required_files(NLTK_DATA):
+        print("Using corpora in {}".format(NLTK_DATA))
+        return
+    import nltk
     print("Downloading corpora...")
-    download_corpora.download_lite()
+    for corpus in REQUIRED_CORPORA:
+        nltk.download(corpus, download_dir=NLTK_DATA)
     print("Finished downloading!")
+
+def bundle(data_dir=BUNDLED_DATA):
+    """
+    Download REQUIRED_CORPORA into data_dir and keep only the extracted
+    files in REQUIRED_FILES, for both python versions.
+    """
+    import nltk
+    for corpus in REQUIRED_CORPORA:
+        nltk.download(corpus, download_dir=data_dir)
+    keep = set(os.path.normpath(os.path.join(data_dir, f))
+               for files in REQUIRED_FILES.values() for f in files)
+    for root, dirs, files in os.walk(data_dir, topdown=False):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path not in keep:
+                os.remove(path)
+        if not os.listdir(root):
+            os.rmdir(root)
+    print("Bundled {} in {}".format(', '.join(REQUIRED_CORPORA), data_dir))
+
+if __name__ == '__main__':
+    if 'bundle' in sys.argv:
+        bundle()